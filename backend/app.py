@@ -1,10 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from model.artifact import MANIFEST_FILE
 from model.recommender import Recommender
+from model.reloader import ReloadableRecommender
 from services.tripadvisor import TripAdvisorService
 from services.openai_service import OpenAIService
+from services.http_client import upstream_stats
+from services.review_store import ReviewQueueFull, ReviewStore
+from services.brief_pool import CityBriefPool
+from services.leader import LeaderLock
+from services.cache import SQLiteCacheBackend, TTLCache
+from services.compression import MIN_COMPRESS_BYTES, choose_encoding, compress
+from services import metrics
 from datetime import datetime, timedelta
 
 env_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -19,20 +32,191 @@ CORS(app)
 
 model_path = os.path.join(os.path.dirname(__file__), 'model/destinai_model.pkl')
 dataset_path = os.path.join(os.path.dirname(__file__), 'model/destinai_final_dataset.csv')
+artifact_dir = os.getenv('RECOMMENDER_ARTIFACT', os.path.join(os.path.dirname(__file__), 'model/artifact'))
+topk_table_path = os.getenv('RECOMMENDER_TOPK_TABLE', os.path.join(os.path.dirname(__file__), 'model/topk_table.npz'))
+preference_log_path = os.getenv('PREFERENCE_LOG_PATH')
+preference_log_lock = threading.Lock()
+
+MAX_BATCH_PROFILES = 10000
+MAX_RECOMMENDATIONS = int(os.getenv('MAX_RECOMMENDATIONS', 50))
+# Longer trips are generated as one request per ITINERARY_CHUNK_DAYS, so this also bounds the upstream fan-out.
+ITINERARY_MAX_DAYS = int(os.getenv('ITINERARY_MAX_DAYS', 30))
+ITINERARY_TIMEOUT = float(os.getenv('ITINERARY_TIMEOUT', 90))
+HOTELS_TIMEOUT = float(os.getenv('HOTELS_TIMEOUT', 20))
+CITY_MAX_AGE = int(os.getenv('CITY_MAX_AGE', 3600))
+
+def load_recommender():
+    return Recommender(
+        model_path, dataset_path, index_backend=os.getenv('RECOMMENDER_INDEX', 'exact'),
+        artifact_dir=artifact_dir, topk_table_path=topk_table_path
+    )
 
 try:
-    recommender = Recommender(model_path, dataset_path)
+    recommender = ReloadableRecommender(
+        load_recommender,
+        watch_paths=[model_path, dataset_path, os.path.join(artifact_dir, MANIFEST_FILE), topk_table_path],
+        warmup=lambda r: r.get_recommendations({})
+    )
 except Exception as e:
     print(f"Failed to load recommender: {e}")
     recommender = None
 
 tripadvisor = TripAdvisorService()
 openai_service = OpenAIService()
+review_store = ReviewStore(
+    os.getenv('REVIEWS_DB_PATH', os.path.join(os.path.dirname(__file__), 'reviews.db')),
+    legacy_csv_path=os.path.join(os.path.dirname(__file__), 'reviews.csv'),
+    start=False,
+    max_queue=int(os.getenv('REVIEW_QUEUE_SIZE', 10000))
+)
+plan_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('PLAN_WORKERS', 32)), thread_name_prefix="plan"
+)
+
+# Compressed /api/city bodies, keyed by content hash and encoding.
+city_payload_cache = TTLCache(max_entries=int(os.getenv('CITY_PAYLOAD_CACHE_SIZE', 2048)), ttl=CITY_MAX_AGE)
+
+brief_store_path = os.getenv('CITY_BRIEF_STORE_PATH')
+brief_pool = CityBriefPool(
+    openai_service.generate_city_brief,
+    refresh_interval=float(os.getenv('CITY_BRIEF_REFRESH', 24 * 3600)),
+    briefs_per_city=int(os.getenv('CITY_BRIEFS_PER_CITY', 1)),
+    workers=int(os.getenv('CITY_BRIEF_WORKERS', 2)),
+    store=SQLiteCacheBackend(brief_store_path, 'city_briefs') if brief_store_path else None,
+    enabled=bool(os.getenv('OPENAI_API_KEY'))
+)
+
+# Cache warm-up runs in one process per machine; the others read what it stores.
+background_leader = LeaderLock(
+    os.getenv('BACKGROUND_LEADER_LOCK', os.path.join(os.path.dirname(__file__), 'destinai.leader.lock'))
+)
+
+def preload_geo_ids(cities):
+    while not background_leader.acquire():
+        time.sleep(60)
+    tripadvisor.preload_geo_ids(cities)
+
+def start_background_work():
+    review_store.start()
+
+    if recommender is not None:
+        recommender.start_watcher(float(os.getenv('RECOMMENDER_WATCH_INTERVAL', 0)))
+
+    if recommender is not None and os.getenv('OPENAI_API_KEY') and os.getenv('CITY_BRIEF_PREWARM', '1').lower() in ('1', 'true', 'yes'):
+        brief_pool.start(recommender.get_city_names(), should_warm=background_leader.acquire)
+
+    if recommender is not None and os.getenv('PRELOAD_GEO_IDS', '').lower() in ('1', 'true', 'yes'):
+        threading.Thread(
+            target=preload_geo_ids, args=(recommender.get_city_names(),), daemon=True
+        ).start()
+
+# serve.py preloads this module before forking and starts the threads in each worker instead.
+# Under `python app.py` the debug reloader's parent only watches files, so the child it serves from
+# (WERKZEUG_RUN_MAIN=true) is the one that starts them and takes the leader lock.
+if os.getenv('DEFER_BACKGROUND_WORK', '').lower() not in ('1', 'true', 'yes') and (
+        __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+    start_background_work()
+
+def cache_metrics():
+    caches = {
+        "itineraries": openai_service.itinerary_cache,
+        "geo_ids": tripadvisor.geo_cache,
+        "hotels": tripadvisor.hotel_cache,
+        "city_payloads": city_payload_cache
+    }
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    briefs = brief_pool.stats()
+    families = [
+        ("destinai_cache_hits_total", "counter", "Cache lookups that found an entry.",
+         [({"cache": name}, s["hits"]) for name, s in stats.items()] + [({"cache": "city_briefs"}, briefs["hits"])]),
+        ("destinai_cache_misses_total", "counter", "Cache lookups that found nothing.",
+         [({"cache": name}, s["misses"]) for name, s in stats.items()] + [({"cache": "city_briefs"}, briefs["misses"])]),
+        ("destinai_cache_entries", "gauge", "Entries currently held in memory.",
+         [({"cache": name}, s["entries"]) for name, s in stats.items()] + [({"cache": "city_briefs"}, briefs["cities"])]),
+    ]
+
+    if recommender is not None:
+        status = recommender.status()
+        families.append(("destinai_recommender_generation", "gauge", "Recommender snapshots loaded by this process.",
+                         [({}, status["generation"])]))
+        families.append(("destinai_recommender_reload_failures_total", "counter", "Recommender reloads that failed.",
+                         [({}, status["failures"])]))
+
+    if recommender is not None and recommender.topk_table is not None:
+        table = recommender.topk_table.stats()
+        for family, key in zip(families, ("hits", "misses", "entries")):
+            family[3].append(({"cache": "topk_table"}, table[key]))
+        families.append(("destinai_topk_table_bytes", "gauge", "Memory held by the precomputed top-k table.",
+                         [({}, table["bytes"])]))
+
+    return families
+
+metrics.REGISTRY.register_collector(cache_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUESTS.observe(
+            time.perf_counter() - started, endpoint, request.method, str(response.status_code)
+        )
+    return response
+
+def log_preferences(profiles):
+    # Feeds `python -m model.topk_table build --log`, which learns the most frequent profiles.
+    if not preference_log_path:
+        return
+    lines = "".join(json.dumps({"preferences": p}, separators=(',', ':')) + "\n" for p in profiles)
+    try:
+        with preference_log_lock, open(preference_log_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+    except OSError as e:
+        print(f"Error writing preference log: {e}")
 
 @app.route('/')
 def home():
     return jsonify({"message": "DestinAI Backend is running!"})
 
+def is_admin_request():
+    token = os.getenv('ADMIN_TOKEN')
+    return bool(token) and request.headers.get('X-Admin-Token') == token
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def reload_recommender():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    if recommender is None:
+        return jsonify({"error": "Recommender model not available"}), 500
+
+    if request.method == 'GET':
+        return jsonify(recommender.status())
+
+    if request.args.get('wait', '').lower() in ('1', 'true', 'yes'):
+        reloaded = recommender.reload()
+        return jsonify({"reloaded": reloaded, **recommender.status()}), 200 if reloaded else 500
+
+    started = recommender.reload_in_background()
+    return jsonify({"started": started, **recommender.status()}), 202 if started else 409
+
+def parse_whole_number(value, name, maximum):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    if isinstance(value, float) and not value.is_integer():
+        number = None
+    if isinstance(value, bool) or number is None or not 1 <= number <= maximum:
+        raise ValueError(f"{name} must be a whole number between 1 and {maximum}")
+    return number
+
+def parse_n_recommendations(data):
+    return parse_whole_number(data.get('n_recommendations', 5), "n_recommendations", MAX_RECOMMENDATIONS)
+
 @app.route('/api/recommend', methods=['POST'])
 def recommend():
     if recommender is None:
@@ -41,58 +225,157 @@ def recommend():
     try:
         data = request.json
         preferences = data.get('preferences', {})
+        n_recommendations = parse_n_recommendations(data)
+        log_preferences([preferences])
 
-        recommendations = recommender.get_recommendations(preferences)
+        recommendations = recommender.get_recommendations(
+            preferences, n_recommendations, filters=data.get('filters'), lean=bool(data.get('lean'))
+        )
         
         if not recommendations:
             return jsonify({"error": "No recommendations found"}), 404
             
         return jsonify({"recommendations": recommendations})
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error in recommend endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    if recommender is None:
+        return jsonify({"error": "Recommender model not available"}), 500
+
+    try:
+        data = request.json
+        profiles = data.get('preferences', [])
+        n_recommendations = parse_n_recommendations(data)
+
+        if not isinstance(profiles, list) or not all(isinstance(p, dict) for p in profiles):
+            return jsonify({"error": "preferences must be a list of preference objects"}), 400
+
+        if len(profiles) > MAX_BATCH_PROFILES:
+            return jsonify({"error": f"At most {MAX_BATCH_PROFILES} profiles per batch"}), 400
+
+        log_preferences(profiles)
+        recommendations = recommender.get_recommendations_batch(
+            profiles, n_recommendations, filters=data.get('filters'), lean=bool(data.get('lean'))
+        )
+
+        return jsonify({"recommendations": recommendations})
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in recommend batch endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/city/<int:city_id>', methods=['GET'])
+def city(city_id):
+    if recommender is None:
+        return jsonify({"error": "Recommender model not available"}), 500
+
+    payload = recommender.get_city_payload(city_id)
+    if payload is None:
+        return jsonify({"error": f"Unknown city {city_id}"}), 404
+
+    body, etag = payload
+    headers = {
+        # Weak, because the gzip and brotli bodies are the same resource.
+        "ETag": f'W/"{etag}"',
+        "Cache-Control": f"public, max-age={CITY_MAX_AGE}",
+        "Vary": "Accept-Encoding"
+    }
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=headers)
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding')) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding is not None:
+        key = (etag, encoding)
+        compressed = city_payload_cache.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            city_payload_cache.set(key, compressed)
+        body = compressed
+        headers["Content-Encoding"] = encoding
+
+    return Response(body, mimetype='application/json', headers=headers)
+
+def find_hotels(city_name, start_date_str, end_date_str):
+    geo = tripadvisor.get_geo_id(city_name)
+
+    if geo and "dest_id" in geo:
+        return tripadvisor.get_hotels(geo["dest_id"], start_date_str, end_date_str)
+
+    print("Geo ID not found, using mock hotels")
+    return tripadvisor.get_mock_hotels()
+
+def wait_for(future, deadline, name):
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic())), True
+    except FutureTimeoutError:
+        print(f"{name} did not finish in time, returning partial plan")
+    except Exception as e:
+        print(f"Error while fetching {name}: {e}")
+    return None, False
+
+def parse_plan_request(data):
+    city_name = data.get('city')
+    user_input = data.get('userInput', "")
+    preferences = data.get('preferences', {})
+    duration = parse_whole_number(data.get('duration', 5), "duration", ITINERARY_MAX_DAYS)
+    start_date_str = data.get('startDate', datetime.now().strftime('%Y-%m-%d'))
+    
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+        end_date = start_date + timedelta(days=int(duration))
+        end_date_str = end_date.strftime('%Y-%m-%d')
+    except:
+        start_date_str = datetime.now().strftime('%Y-%m-%d')
+        end_date_str = (datetime.now() + timedelta(days=5)).strftime('%Y-%m-%d')
+
+    return city_name, user_input, preferences, duration, start_date_str, end_date_str
+
 @app.route('/api/plan', methods=['POST'])
 def plan():
     try:
-        data = request.json
-        city_name = data.get('city')
-        user_input = data.get('userInput', "")
-        preferences = data.get('preferences', {})
-        
+        city_name, user_input, preferences, duration, start_date_str, end_date_str = parse_plan_request(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in plan endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    try:
         if not city_name:
              return jsonify({"error": "City name is required"}), 400
 
-        duration = data.get('duration', 5)
-        start_date_str = data.get('startDate', datetime.now().strftime('%Y-%m-%d'))
-        
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = start_date + timedelta(days=int(duration))
-            end_date_str = end_date.strftime('%Y-%m-%d')
-        except:
-            start_date_str = datetime.now().strftime('%Y-%m-%d')
-            end_date_str = (datetime.now() + timedelta(days=5)).strftime('%Y-%m-%d')
-
-        itinerary = openai_service.get_itinerary(
+        started = time.monotonic()
+
+        itinerary_future = plan_executor.submit(
+            openai_service.get_itinerary,
             city_name, preferences, duration, start_date_str, end_date_str, user_input
         )
-        
-        geo = tripadvisor.get_geo_id(city_name)
-        hotels = None
+        hotels_future = plan_executor.submit(find_hotels, city_name, start_date_str, end_date_str)
 
-        if geo and "dest_id" in geo:
-            hotels = tripadvisor.get_hotels(geo["dest_id"], start_date_str, end_date_str)
-        else:
-            print("Geo ID not found, using mock hotels")
+        hotels, hotels_ok = wait_for(hotels_future, started + HOTELS_TIMEOUT, "hotels")
+        itinerary, itinerary_ok = wait_for(itinerary_future, started + ITINERARY_TIMEOUT, "itinerary")
+
+        if not hotels_ok:
             hotels = tripadvisor.get_mock_hotels()
-            
+        itinerary_ok = itinerary_ok and itinerary is not None
+
         response = {
             "city": city_name,
             "itinerary": itinerary,
             "hotels": hotels
         }
+
+        partial = [name for name, ok in (("itinerary", itinerary_ok), ("hotels", hotels_ok)) if not ok]
+        if partial:
+            response["partial"] = partial
         
         return jsonify(response)
 
@@ -100,6 +383,79 @@ def plan():
         print(f"Error in plan endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+@app.route('/api/plan/stream', methods=['POST'])
+def plan_stream():
+    try:
+        city_name, user_input, preferences, duration, start_date_str, end_date_str = parse_plan_request(request.json)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in plan stream endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    if not city_name:
+        return jsonify({"error": "City name is required"}), 400
+
+    started = time.monotonic()
+    hotels_future = plan_executor.submit(find_hotels, city_name, start_date_str, end_date_str)
+
+    def hotels_event(wait):
+        if wait:
+            hotels, hotels_ok = wait_for(hotels_future, started + HOTELS_TIMEOUT, "hotels")
+        else:
+            hotels, hotels_ok = wait_for(hotels_future, 0, "hotels")
+        if not hotels_ok:
+            hotels = tripadvisor.get_mock_hotels()
+        return {"type": "hotels", "hotels": hotels}, hotels_ok
+
+    def generate():
+        yield ndjson({"type": "start", "city": city_name, "duration": duration})
+
+        hotels_ok = None
+        days = 0
+        itinerary_ok = True
+
+        try:
+            for kind, value in openai_service.stream_itinerary(
+                city_name, preferences, duration, start_date_str, end_date_str, user_input
+            ):
+                if kind == "day":
+                    days += 1
+                    yield ndjson({"type": "day", "day": value})
+                elif kind == "incomplete":
+                    itinerary_ok = False
+                else:
+                    yield ndjson({"type": "raw_text", "raw_text": value})
+
+                if hotels_ok is None and hotels_future.done():
+                    event, hotels_ok = hotels_event(wait=False)
+                    yield ndjson(event)
+
+                if time.monotonic() - started > ITINERARY_TIMEOUT:
+                    print("itinerary stream did not finish in time, returning partial plan")
+                    itinerary_ok = False
+                    break
+        except Exception as e:
+            print(f"Error in plan stream endpoint: {e}")
+            itinerary_ok = False
+
+        if hotels_ok is None:
+            event, hotels_ok = hotels_event(wait=True)
+            yield ndjson(event)
+
+        itinerary_ok = itinerary_ok and days > 0
+        partial = [name for name, ok in (("itinerary", itinerary_ok), ("hotels", hotels_ok)) if not ok]
+        yield ndjson({"type": "done", "partial": partial})
+
+    return Response(
+        metrics.timed_stream(generate(), request.url_rule.rule, g.get('request_started', time.perf_counter())),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.route('/api/lucky', methods=['GET'])
 def lucky():
     if recommender is None:
@@ -114,20 +470,42 @@ def lucky():
         city_name = random_city_data['city']
         country = random_city_data['country']
 
-        description = openai_service.get_city_brief(city_name)
+        description = brief_pool.get(city_name) or openai_service.fallback_city_brief(city_name)
         
         return jsonify({
-            "id": int(random_city_data['details'].get('id', 0)) if 'id' in random_city_data['details'] else 0,
+            "id": random_city_data['id'],
             "name": city_name,
             "country": country,
             "desc": description,
-            "image": random_city_data['details'].get('city_photo', "")
+            "image": random_city_data['image']
         })
 
     except Exception as e:
         print(f"Error in lucky endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "itineraries": openai_service.itinerary_cache.stats(),
+        "geo_ids": tripadvisor.geo_cache.stats(),
+        "hotels": tripadvisor.hotel_cache.stats(),
+        "city_payloads": city_payload_cache.stats(),
+        "city_briefs": brief_pool.stats(),
+        "coalescing": {
+            "openai": openai_service.flights.stats(),
+            "tripadvisor": tripadvisor.flights.stats()
+        }
+    })
+
+@app.route('/api/upstreams/stats', methods=['GET'])
+def upstreams_stats():
+    return jsonify(upstream_stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/review', methods=['POST'])
 def review():
     try:
@@ -139,17 +517,12 @@ def review():
         if not rating:
              return jsonify({"error": "Rating is required"}), 400
 
-        reviews_file = os.path.join(os.path.dirname(__file__), 'reviews.csv')
-        file_exists = os.path.isfile(reviews_file)
-        
-        import csv
-        with open(reviews_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow(['timestamp', 'city', 'rating', 'comment'])
-            
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            writer.writerow([timestamp, city, rating, comment])
+        try:
+            review_store.add(city, rating, comment)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except ReviewQueueFull as e:
+            return jsonify({"error": str(e)}), 503
             
         return jsonify({"message": "Review saved successfully"})
 
@@ -157,5 +530,13 @@ def review():
         print(f"Error in review endpoint: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/reviews/<path:city>/summary', methods=['GET'])
+def review_summary(city):
+    try:
+        return jsonify(review_store.summary(city))
+    except Exception as e:
+        print(f"Error in review summary endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,228 @@
+import asyncio
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, Response, g, jsonify, request
+
+import app as sync_app
+from app import HOTELS_TIMEOUT, ITINERARY_TIMEOUT, ndjson, parse_plan_request
+from services import metrics
+from services.openai_service import AsyncOpenAIService
+from services.tripadvisor import AsyncTripAdvisorService
+
+# Served natively on the event loop; every other route is handed to the Flask app on a thread.
+ASYNC_PATHS = {'/api/plan', '/api/plan/stream', '/api/lucky'}
+
+async_app = Quart(__name__)
+
+openai_service = AsyncOpenAIService(itinerary_cache=sync_app.openai_service.itinerary_cache)
+tripadvisor = AsyncTripAdvisorService(
+    geo_cache=sync_app.tripadvisor.geo_cache, hotel_cache=sync_app.tripadvisor.hotel_cache
+)
+
+background_tasks = set()
+
+def spawn(coroutine):
+    task = asyncio.ensure_future(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@async_app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@async_app.after_request
+async def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUESTS.observe(
+            time.perf_counter() - started, endpoint, request.method, str(response.status_code)
+        )
+    return response
+
+@async_app.after_request
+async def add_cors_headers(response):
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    if request.method == 'OPTIONS':
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type'
+        )
+    return response
+
+@async_app.after_serving
+async def close_clients():
+    await openai_service.http.aclose()
+    await tripadvisor.http.aclose()
+
+async def find_hotels(city_name, start_date_str, end_date_str):
+    geo = await tripadvisor.get_geo_id(city_name)
+
+    if geo and "dest_id" in geo:
+        return await tripadvisor.get_hotels(geo["dest_id"], start_date_str, end_date_str)
+
+    print("Geo ID not found, using mock hotels")
+    return tripadvisor.get_mock_hotels()
+
+async def wait_for(task, deadline, name):
+    # shield() keeps the upstream call running past the deadline so its result still lands in the cache.
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), max(0.0, deadline - time.monotonic())), True
+    except asyncio.TimeoutError:
+        print(f"{name} did not finish in time, returning partial plan")
+    except Exception as e:
+        print(f"Error while fetching {name}: {e}")
+    return None, False
+
+@async_app.route('/api/plan', methods=['POST'])
+async def plan():
+    try:
+        city_name, user_input, preferences, duration, start_date_str, end_date_str = parse_plan_request(
+            await request.get_json()
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in plan endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    try:
+        if not city_name:
+            return jsonify({"error": "City name is required"}), 400
+
+        started = time.monotonic()
+
+        itinerary_task = spawn(openai_service.get_itinerary(
+            city_name, preferences, duration, start_date_str, end_date_str, user_input
+        ))
+        hotels_task = spawn(find_hotels(city_name, start_date_str, end_date_str))
+
+        hotels, hotels_ok = await wait_for(hotels_task, started + HOTELS_TIMEOUT, "hotels")
+        itinerary, itinerary_ok = await wait_for(itinerary_task, started + ITINERARY_TIMEOUT, "itinerary")
+
+        if not hotels_ok:
+            hotels = tripadvisor.get_mock_hotels()
+        itinerary_ok = itinerary_ok and itinerary is not None
+
+        response = {
+            "city": city_name,
+            "itinerary": itinerary,
+            "hotels": hotels
+        }
+
+        partial = [name for name, ok in (("itinerary", itinerary_ok), ("hotels", hotels_ok)) if not ok]
+        if partial:
+            response["partial"] = partial
+
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"Error in plan endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@async_app.route('/api/plan/stream', methods=['POST'])
+async def plan_stream():
+    try:
+        city_name, user_input, preferences, duration, start_date_str, end_date_str = parse_plan_request(
+            await request.get_json()
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error in plan stream endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    if not city_name:
+        return jsonify({"error": "City name is required"}), 400
+
+    started = time.monotonic()
+    hotels_task = spawn(find_hotels(city_name, start_date_str, end_date_str))
+
+    async def hotels_event(wait):
+        deadline = started + HOTELS_TIMEOUT if wait else 0
+        hotels, hotels_ok = await wait_for(hotels_task, deadline, "hotels")
+        if not hotels_ok:
+            hotels = tripadvisor.get_mock_hotels()
+        return {"type": "hotels", "hotels": hotels}, hotels_ok
+
+    async def generate():
+        yield ndjson({"type": "start", "city": city_name, "duration": duration})
+
+        hotels_ok = None
+        days = 0
+        itinerary_ok = True
+
+        try:
+            async for kind, value in openai_service.stream_itinerary(
+                city_name, preferences, duration, start_date_str, end_date_str, user_input
+            ):
+                if kind == "day":
+                    days += 1
+                    yield ndjson({"type": "day", "day": value})
+                elif kind == "incomplete":
+                    itinerary_ok = False
+                else:
+                    yield ndjson({"type": "raw_text", "raw_text": value})
+
+                if hotels_ok is None and hotels_task.done():
+                    event, hotels_ok = await hotels_event(wait=False)
+                    yield ndjson(event)
+
+                if time.monotonic() - started > ITINERARY_TIMEOUT:
+                    print("itinerary stream did not finish in time, returning partial plan")
+                    itinerary_ok = False
+                    break
+        except Exception as e:
+            print(f"Error in plan stream endpoint: {e}")
+            itinerary_ok = False
+
+        if hotels_ok is None:
+            event, hotels_ok = await hotels_event(wait=True)
+            yield ndjson(event)
+
+        itinerary_ok = itinerary_ok and days > 0
+        partial = [name for name, ok in (("itinerary", itinerary_ok), ("hotels", hotels_ok)) if not ok]
+        yield ndjson({"type": "done", "partial": partial})
+
+    return Response(
+        metrics.async_timed_stream(generate(), request.url_rule.rule, g.get('request_started', time.perf_counter())),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@async_app.route('/api/lucky', methods=['GET'])
+async def lucky():
+    if sync_app.recommender is None:
+        return jsonify({"error": "Recommender model not available"}), 500
+
+    try:
+        random_city_data = sync_app.recommender.get_random_city()
+        if not random_city_data:
+            return jsonify({"error": "Could not select a random city"}), 500
+
+        city_name = random_city_data['city']
+        country = random_city_data['country']
+
+        description = sync_app.brief_pool.get(city_name) or openai_service.fallback_city_brief(city_name)
+
+        return jsonify({
+            "id": random_city_data['id'],
+            "name": city_name,
+            "country": country,
+            "desc": description,
+            "image": random_city_data['image']
+        })
+
+    except Exception as e:
+        print(f"Error in lucky endpoint: {e}")
+        return jsonify({"error": str(e)}), 500
+
+wsgi_app = WsgiToAsgi(sync_app.app)
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASYNC_PATHS:
+        await wsgi_app(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
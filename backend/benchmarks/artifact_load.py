@@ -0,0 +1,49 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from model.artifact import is_artifact
+from model.recommender import Recommender
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+
+def time_load(repeat, **kwargs):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            Recommender(**kwargs)
+        timings.append(time.perf_counter() - started)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommender startup time: pickle + CSV versus exported artifact")
+    parser.add_argument('--model', default=os.path.join(BASE_DIR, 'model/destinai_model.pkl'))
+    parser.add_argument('--dataset', default=os.path.join(BASE_DIR, 'model/destinai_final_dataset.csv'))
+    parser.add_argument('--artifact', default=os.path.join(BASE_DIR, 'model/artifact'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not is_artifact(args.artifact):
+        sys.exit(f"No artifact at {args.artifact}; run 'python -m model.artifact export' first")
+
+    warnings.filterwarnings('ignore')
+    sources = (
+        ("pickle + csv", {}),
+        ("artifact", {"artifact_dir": args.artifact}),
+    )
+    for label, options in sources:
+        best, mean = time_load(args.repeat, model_path=args.model, dataset_path=args.dataset, **options)
+        print(f"{label:<14} best {best * 1000:8.1f}ms  mean {mean * 1000:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
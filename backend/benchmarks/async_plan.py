@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import StubResponse, percentile, rss_bytes
+from services.http_client import AsyncHTTPClient
+
+ITINERARY_TEXT = "\n".join(
+    f"Day {d}: Day {d} in the city\n- Morning: Museum - Art.\n- Afternoon: Market - Food.\n- Evening: Bar - Drinks."
+    for d in range(1, 6)
+)
+
+
+def stub_payload(url, params):
+    endpoint = url.rsplit('/', 1)[-1]
+    if endpoint == 'completions':
+        return {'choices': [{'message': {'content': ITINERARY_TEXT}}]}
+    if endpoint == 'searchDestination':
+        return {'status': True, 'data': [{'dest_id': params['query']}]}
+    if endpoint == 'searchHotels':
+        hotels = [{'property': {'name': f'Hotel {i}', 'reviewScore': 8.5, 'photoUrls': [], 'id': i}} for i in range(5)]
+        return {'data': {'hotels': hotels}}
+    return {'data': {'url': f"https://example.com/hotel/{params['hotel_id']}"}}
+
+
+class Sampler:
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def plan_body(i):
+    return {"city": f"City {i}, Country", "duration": 5, "startDate": "2026-07-01", "userInput": "food"}
+
+
+def reset(app_module):
+    app_module.openai_service.itinerary_cache.clear()
+    app_module.tripadvisor.geo_cache.clear()
+    app_module.tripadvisor.hotel_cache.clear()
+
+
+def run_sync(app_module, n_requests, threads, latency):
+    def stub(session, method, url, params=None, **kwargs):
+        time.sleep(latency)
+        return StubResponse(stub_payload(url, params))
+
+    # Give the sync path as many helper threads as it can use so only the server thread count limits it.
+    app_module.plan_executor = ThreadPoolExecutor(max_workers=2 * threads)
+    app_module.tripadvisor.details_executor = ThreadPoolExecutor(max_workers=5 * threads)
+    client = app_module.app.test_client()
+
+    def send(i):
+        started = time.perf_counter()
+        status = client.post('/api/plan', json=plan_body(i)).status_code
+        return status, time.perf_counter() - started
+
+    with mock.patch.object(requests.Session, 'request', stub), Sampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as server:
+            results = list(server.map(send, range(n_requests)))
+        elapsed = time.perf_counter() - started
+
+    app_module.plan_executor.shutdown()
+    app_module.tripadvisor.details_executor.shutdown()
+    return elapsed, results, sampler
+
+
+def run_async(asgi_module, n_requests, latency):
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json=stub_payload(str(request.url.copy_with(query=None)), dict(request.url.params)))
+
+    transport = httpx.MockTransport(handler)
+    asgi_module.openai_service.http = AsyncHTTPClient("openai", transport=transport, pool_size=n_requests)
+    asgi_module.tripadvisor.http = AsyncHTTPClient("tripadvisor", transport=transport, pool_size=n_requests)
+    client = asgi_module.async_app.test_client()
+
+    async def send(i):
+        started = time.perf_counter()
+        response = await client.post('/api/plan', json=plan_body(i))
+        return response.status_code, time.perf_counter() - started
+
+    async def burst():
+        return await asyncio.gather(*(send(i) for i in range(n_requests)))
+
+    with Sampler() as sampler:
+        started = time.perf_counter()
+        results = asyncio.run(burst())
+        elapsed = time.perf_counter() - started
+
+    return elapsed, results, sampler
+
+
+def report(label, elapsed, results, sampler, baseline_rss):
+    latencies = [seconds for _, seconds in results]
+    ok = sum(1 for status, _ in results if status == 200)
+    print(f"{label:<28} {len(results)} requests ({ok} ok) in {elapsed:6.2f}s  "
+          f"p50 {percentile(latencies, 0.5):5.2f}s  p99 {percentile(latencies, 0.99):5.2f}s  "
+          f"peak threads {sampler.peak_threads:4d}  peak RSS +{(sampler.peak_rss - baseline_rss) / 2**20:6.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent /api/plan requests: sync Flask views versus async views")
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, nargs='+', default=[16, 300],
+                        help="sync server thread counts to compare")
+    parser.add_argument('--latency', type=float, default=0.5, help="stub upstream latency in seconds")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+        import asgi as asgi_module
+
+    for threads in args.threads:
+        reset(app_module)
+        baseline_rss = rss_bytes()
+        with contextlib.redirect_stdout(io.StringIO()):
+            elapsed, results, sampler = run_sync(app_module, args.requests, threads, args.latency)
+        report(f"sync, {threads} threads", elapsed, results, sampler, baseline_rss)
+
+    reset(app_module)
+    baseline_rss = rss_bytes()
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, results, sampler = run_async(asgi_module, args.requests, args.latency)
+    report("async, 1 event loop", elapsed, results, sampler, baseline_rss)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os
+
+# Helpers shared by the benchmark scripts.
+
+
+class StubResponse:
+    # Stands in for a requests.Response when a benchmark patches the HTTP client's session.
+    def __init__(self, data):
+        self.status_code = 200
+        self.headers = {}
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
@@ -0,0 +1,107 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from model.recommender import FeatureEncoder, Recommender
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'destinai_model.pkl')
+
+INTERESTS = ['culture', 'adventure', 'nature', 'beaches', 'nightlife', 'cuisine', 'wellness', 'urban', 'seclusion']
+
+EDGE_CASES = [
+    {},
+    {'ideal_durations': 'Longtrip', 'best_months': []},
+    {'ideal_durations': ['Week', '2Weeks'], 'best_months': ['08']},
+    {'ideal_durations': ["'Shorttrip'"], 'best_months': ['8', '13', 'Aug']},
+    {'ideal_durations': ['Unknown'], 'best_months': ['01', '01', '12']},
+    {'ideal_durations': ['Short', 'Long', '10Days'], 'best_months': '07'},
+    {'budget_levl': 7, 'culture': 3, 'seclusion': -1, 'best_months': ['02', '03', '04', '05', '06']},
+    {'budget_levl': '1', 'urban': '1', 'nightlife': True},
+]
+
+
+def random_preferences(n_rows, rng):
+    profiles = []
+    for _ in range(n_rows):
+        profile = {name: int(rng.integers(0, 2)) for name in INTERESTS}
+        profile['budget_levl'] = int(rng.integers(1, 4))
+        profile['ideal_durations'] = list(rng.choice(['Shorttrip', 'Longtrip', 'Week', 'Long'], size=rng.integers(0, 3)))
+        profile['best_months'] = ['%02d' % m for m in rng.choice(np.arange(1, 13), size=rng.integers(0, 5))]
+        profiles.append(profile)
+    return profiles
+
+
+def dense(matrix):
+    return matrix.toarray() if hasattr(matrix, 'toarray') else np.asarray(matrix)
+
+
+def check(preprocessor, rows, label):
+    expected = dense(preprocessor.transform(pd.DataFrame(rows)))
+    actual = FeatureEncoder(preprocessor).encode_many(rows)
+    max_error = float(np.max(np.abs(expected - actual))) if len(rows) else 0.0
+    if not np.allclose(expected, actual, rtol=0, atol=1e-12):
+        raise SystemExit(f"{label}: encoder output differs from preprocessor.transform (max error {max_error:.3g})")
+    print(f"{label}: {len(rows)} rows match (max error {max_error:.3g})")
+
+
+def variant_preprocessors(rows):
+    frame = pd.DataFrame(rows)
+    for options in ({'sublinear_tf': True}, {'binary': True, 'norm': 'l1'}, {'use_idf': False, 'norm': None}):
+        preprocessor = ColumnTransformer([
+            ('durations_tfidf', TfidfVectorizer(**options), 'ideal_durations'),
+            ('months_tfidf', TfidfVectorizer(**options), 'best_months'),
+            ('numeric_scaler', StandardScaler(with_mean=False), ['budget_levl']),
+            ('binary_passthrough', 'passthrough', INTERESTS),
+        ])
+        yield options, preprocessor.fit(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check FeatureEncoder against preprocessor.transform and time both")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(args.seed)
+    preprocessor = joblib.load(MODEL_PATH).named_steps['preprocessor']
+
+    edge_rows = [Recommender._preference_row(p) for p in EDGE_CASES]
+    random_rows = [Recommender._preference_row(p) for p in random_preferences(args.rows, rng)]
+
+    check(preprocessor, edge_rows, "edge cases")
+    check(preprocessor, random_rows, "random profiles")
+    for options, variant in variant_preprocessors(random_rows):
+        check(variant, edge_rows + random_rows, f"refit {options}")
+
+    encoder = FeatureEncoder(preprocessor)
+    row = random_rows[0]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        preprocessor.transform(pd.DataFrame([row]))
+    sklearn_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        encoder.encode(row)
+    encoder_us = (time.perf_counter() - start) / args.repeat * 1e6
+
+    print(f"single query: preprocessor.transform {sklearn_us:.1f} us, FeatureEncoder {encoder_us:.1f} us "
+          f"({sklearn_us / encoder_us:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import percentile
+from model.recommender import Recommender
+from synthetic import MONTHS, synthetic_preferences, write_fixture
+
+
+def random_filters(rng):
+    filters = {'months': [MONTHS[int(rng.integers(0, 12))]]}
+    if rng.random() < 0.5:
+        filters['budget'] = [int(rng.integers(1, 4))]
+    if rng.random() < 0.3:
+        filters['durations'] = ['Longtrip']
+    return filters
+
+
+def matches(recommender, details, constraints):
+    fields = {
+        'months': recommender.clean_and_parse_list(details.get('best_months')),
+        'durations': recommender.clean_and_parse_list(details.get('ideal_durations')),
+        'budget': recommender._budget_values(details.get('budget_levl'))
+    }
+    return all(fields[field] & values for field, values in constraints.items())
+
+
+def post_filter(recommender, preferences, filters, k):
+    # The alternative to the inverted index: ask for more neighbours until k of them pass the filters.
+    constraints = recommender._filter_constraints(filters)
+    fetch = k
+    while True:
+        found = [
+            rec for rec in recommender.get_recommendations(preferences, fetch)
+            if matches(recommender, rec['details'], constraints)
+        ]
+        if len(found) >= k or fetch >= len(recommender.index):
+            return found[:k]
+        fetch = min(fetch * 4, len(recommender.index))
+
+
+def timed(call, *args):
+    started = time.perf_counter()
+    result = call(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hard-filtered recommendations: inverted bitsets versus post-filtering")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--backend', default='exact', choices=['exact', 'ivf'])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(args.seed + 1)
+    queries = synthetic_preferences(args.queries, rng)
+    filters = [random_filters(rng) for _ in queries]
+
+    print(f"{'rows':>8} {'method':<12} {'p50 ms':>8} {'p99 ms':>8} {'selectivity':>12} {'bitsets KiB':>12}")
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in args.sizes:
+            model_path, dataset_path = write_fixture(size, out_dir, args.seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                recommender = Recommender(model_path, dataset_path, index_backend=args.backend)
+
+            selectivity = np.mean([len(recommender.filter_candidates(f)) / size for f in filters])
+            latencies = {'bitsets': [], 'post-filter': []}
+
+            for preferences, query_filters in zip(queries, filters):
+                filtered, seconds = timed(recommender.get_recommendations, preferences, args.k, query_filters)
+                latencies['bitsets'].append(seconds)
+                reference, seconds = timed(post_filter, recommender, preferences, query_filters, args.k)
+                latencies['post-filter'].append(seconds)
+
+                if args.backend == 'exact' and not np.allclose(
+                    [r['distance'] for r in filtered], [r['distance'] for r in reference]
+                ):
+                    raise SystemExit(f"filtered search disagrees with post-filtering for {query_filters}")
+
+            for method, values in latencies.items():
+                print(f"{size:>8} {method:<12} {percentile(values, 0.5) * 1000:>8.3f} "
+                      f"{percentile(values, 0.99) * 1000:>8.3f} {selectivity:>12.3f} "
+                      f"{recommender.filter_index.nbytes() / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
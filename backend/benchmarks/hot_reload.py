@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import percentile
+from model.artifact import export_artifact
+from model.recommender import Recommender
+from model.reloader import ReloadableRecommender
+from synthetic import synthetic_preferences, write_fixture
+
+
+class Load:
+    def __init__(self, recommender, queries, threads):
+        self.recommender = recommender
+        self.queries = queries
+        self.samples = []
+        self.errors = []
+        self.sizes = set()
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(threads)]
+
+    def _run(self, offset):
+        i = offset
+        while not self._stop.is_set():
+            preferences = self.queries[i % len(self.queries)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                recommendations = self.recommender.get_recommendations(preferences)
+            except Exception as e:
+                self.errors.append(str(e))
+                continue
+            finished = time.perf_counter()
+            self.samples.append((started, finished - started))
+
+            # City names and details come from different arrays; a torn snapshot would pair them wrongly.
+            for rec in recommendations:
+                if rec['city'] != rec['details']['city']:
+                    self.errors.append(f"{rec['city']} returned with details of {rec['details']['city']}")
+            self.sizes.add(len(self.recommender.current.index))
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def window(samples, start, end):
+    return [seconds for started, seconds in samples if start <= started < end]
+
+
+def describe(label, latencies):
+    if not latencies:
+        print(f"{label:<16} no requests")
+        return
+    print(f"{label:<16} {len(latencies):>7} requests  p50 {percentile(latencies, 0.5) * 1000:7.3f}ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.3f}ms  max {max(latencies) * 1000:8.3f}ms")
+
+
+def install(source, target):
+    # Write next to the target and rename over it, the way a deploy should replace the files.
+    shutil.copyfile(source, target + '.tmp')
+    os.replace(target + '.tmp', target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency and consistency while the recommender hot-reloads")
+    parser.add_argument('--old-size', type=int, default=20000)
+    parser.add_argument('--new-size', type=int, default=25000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--settle', type=float, default=2.0, help="seconds of load before and after the reload")
+    parser.add_argument('--artifact', action='store_true', help="ship the new version as an exported artifact")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    queries = synthetic_preferences(500, np.random.default_rng(args.seed + 1))
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        old_model, old_dataset = write_fixture(args.old_size, out_dir, args.seed)
+        new_model, new_dataset = write_fixture(args.new_size, out_dir, args.seed + 1)
+
+        model_path = os.path.join(out_dir, 'destinai_model.pkl')
+        dataset_path = os.path.join(out_dir, 'destinai_final_dataset.csv')
+        artifact_dir = os.path.join(out_dir, 'artifact')
+        install(old_model, model_path)
+        install(old_dataset, dataset_path)
+
+        def factory():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return Recommender(model_path, dataset_path, artifact_dir=artifact_dir)
+
+        recommender = ReloadableRecommender(factory, warmup=lambda r: r.get_recommendations({}))
+
+        with Load(recommender, queries, args.threads) as load:
+            time.sleep(args.settle)
+
+            if args.artifact:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    export_artifact(Recommender(new_model, new_dataset), artifact_dir)
+            else:
+                install(new_model, model_path)
+                install(new_dataset, dataset_path)
+
+            reload_started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                reloaded = recommender.reload()
+            reload_finished = time.perf_counter()
+            time.sleep(args.settle)
+
+        if not reloaded:
+            raise SystemExit(f"reload failed: {recommender.status()['last_error']}")
+
+        print(f"reloaded {args.old_size} -> {len(recommender.current.index)} cities "
+              f"({'artifact' if args.artifact else 'pickle + CSV'}) in {reload_finished - reload_started:.2f}s "
+              f"under {args.threads} request threads")
+        describe("before reload", window(load.samples, 0, reload_started))
+        describe("during reload", window(load.samples, reload_started, reload_finished))
+        describe("after reload", window(load.samples, reload_finished, float('inf')))
+        print(f"snapshot sizes seen: {sorted(load.sizes)}, errors: {len(load.errors)}")
+        for error in load.errors[:5]:
+            print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from model.index import ExactIndex, IVFIndex
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'destinai_model.pkl')
+
+INTERESTS = ['culture', 'adventure', 'nature', 'beaches', 'nightlife', 'cuisine', 'wellness', 'urban', 'seclusion']
+
+
+def synthetic_preferences(n_rows, rng):
+    durations = rng.choice(['["Shorttrip"]', '["Longtrip"]', '["Shorttrip", "Longtrip"]'], size=n_rows)
+
+    season_start = rng.integers(0, 12, size=n_rows)
+    season_length = rng.integers(1, 5, size=n_rows)
+    months = [
+        str(['%02d' % ((start + offset) % 12 + 1) for offset in range(length)]).replace("'", '"')
+        for start, length in zip(season_start, season_length)
+    ]
+
+    data = {
+        'ideal_durations': durations,
+        'budget_levl': rng.integers(1, 4, size=n_rows),
+        **{name: rng.integers(0, 2, size=n_rows) for name in INTERESTS},
+        'best_months': months,
+    }
+    return pd.DataFrame(data)
+
+
+def encode(preprocessor, frame):
+    matrix = preprocessor.transform(frame)
+    if hasattr(matrix, 'toarray'):
+        matrix = matrix.toarray()
+    return np.asarray(matrix, dtype=np.float64)
+
+
+def recall_at_k(exact_distances, approx_distances, eps=1e-9):
+    # Ties are common in this feature space, so a hit is any neighbour no
+    # farther than the exact k-th distance rather than a specific row id.
+    kth = exact_distances[:, -1:]
+    return float(np.mean(approx_distances <= kth + eps))
+
+
+def query_latencies(index, queries, k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of recommender index backends")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[2, 4, 8, 16])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    preprocessor = joblib.load(MODEL_PATH).named_steps['preprocessor']
+    rng = np.random.default_rng(args.seed)
+    queries = encode(preprocessor, synthetic_preferences(args.queries, rng))
+
+    print(f"{'rows':>8} {'backend':<12} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for size in args.sizes:
+        vectors = encode(preprocessor, synthetic_preferences(size, rng))
+
+        start = time.perf_counter()
+        exact = ExactIndex(vectors)
+        build_time = time.perf_counter() - start
+        exact_distances, _ = exact.search(queries, args.k)
+        latencies = query_latencies(exact, queries, args.k)
+        print(f"{size:>8} {'exact':<12} {build_time:>8.2f} {1.0:>9.3f} "
+              f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(vectors, seed=args.seed)
+        build_time = time.perf_counter() - start
+
+        for n_probe in args.n_probe:
+            ivf.n_probe = min(n_probe, ivf.n_lists)
+            approx_distances, _ = ivf.search(queries, args.k)
+            latencies = query_latencies(ivf, queries, args.k)
+            label = f"ivf/{ivf.n_probe}of{ivf.n_lists}"
+            print(f"{size:>8} {label:<12} {build_time:>8.2f} {recall_at_k(exact_distances, approx_distances):>9.3f} "
+                  f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from unittest import mock
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import StubResponse
+from services import openai_service
+from services.cache import TTLCache
+from services.http_client import AsyncHTTPClient
+from services.openai_service import AsyncOpenAIService, OpenAIService
+
+RANGE_PATTERN = re.compile(r"Create days (\d+) to (\d+)")
+TRIP_PATTERN = re.compile(r"(\d+)-day trip|for exactly \*\*(\d+) days")
+
+
+class StubModel:
+    # Generates a well-formed itinerary for whatever day range the prompt asks for, at a fixed
+    # token rate, and cuts it off at max_tokens the way the real API does.
+    def __init__(self, ttft, tokens_per_second, tokens_per_day):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.chars_per_token = len(self.day_text(1)) / tokens_per_day
+
+    @staticmethod
+    def day_text(day):
+        return "\n".join([
+            f"Day {day}: Exploring quarter {day} and its surroundings",
+            f"- Morning: Visit the cathedral of district {day} - Admire the gothic nave, the cloister and "
+            f"the 14th-century frescoes before the tour groups arrive.",
+            f"- Afternoon: Lunch at the market hall {day} - Sample local cheeses, cured meats and custard "
+            f"pastries from the family-run stalls on the upper floor.",
+            f"- Evening: Sunset walk along the river {day} - Follow the waterfront promenade and finish "
+            f"with drinks at a terrace overlooking the old town.",
+            "",
+            ""
+        ])
+
+    def completion(self, payload):
+        prompt = payload['messages'][-1]['content']
+        match = RANGE_PATTERN.search(prompt)
+        if match:
+            first, last = int(match.group(1)), int(match.group(2))
+        else:
+            trip = TRIP_PATTERN.search(prompt)
+            first, last = 1, int(trip.group(1) or trip.group(2))
+
+        text = "".join(self.day_text(day) for day in range(first, last + 1))
+        limit = int(payload['max_tokens'] * self.chars_per_token)
+        return text[:limit], "length" if len(text) > limit else "stop"
+
+    def seconds(self, text):
+        return self.ttft + len(text) / self.chars_per_token / self.tokens_per_second
+
+
+def sync_run(model, duration):
+    def stub(session, method, url, json=None, **kwargs):
+        text, finish_reason = model.completion(json)
+        time.sleep(model.seconds(text))
+        return StubResponse({'choices': [{'message': {'content': text}, 'finish_reason': finish_reason}]})
+
+    service = OpenAIService(itinerary_cache=TTLCache(max_entries=16))
+    with mock.patch.object(requests.Session, 'request', stub):
+        started = time.perf_counter()
+        itinerary = service.get_itinerary("Lisbon, Portugal", {}, duration, "2026-07-01", "2026-07-21", "")
+        return time.perf_counter() - started, itinerary
+
+
+def async_stream_run(model, duration):
+    async def handler(request):
+        payload = json.loads(request.content)
+        text, finish_reason = model.completion(payload)
+
+        async def events():
+            await asyncio.sleep(model.ttft)
+            for start in range(0, len(text), 16):
+                piece = text[start:start + 16]
+                await asyncio.sleep(len(piece) / model.chars_per_token / model.tokens_per_second)
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n".encode()
+            yield f"data: {json.dumps({'choices': [{'delta': {}, 'finish_reason': finish_reason}]})}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+
+        if payload.get('stream'):
+            return httpx.Response(200, content=events())
+        await asyncio.sleep(model.seconds(text))
+        return httpx.Response(200, json={'choices': [{'message': {'content': text}, 'finish_reason': finish_reason}]})
+
+    service = AsyncOpenAIService(
+        itinerary_cache=TTLCache(max_entries=16),
+        http_client=AsyncHTTPClient("openai", transport=httpx.MockTransport(handler))
+    )
+
+    async def consume():
+        started = time.perf_counter()
+        first_day = None
+        days = []
+        async for kind, value in service.stream_itinerary("Lisbon, Portugal", {}, duration, "2026-07-01", "2026-07-21", ""):
+            if kind == "day":
+                if first_day is None:
+                    first_day = time.perf_counter() - started
+                days.append(value)
+        await service.http.aclose()
+        return time.perf_counter() - started, first_day, days
+
+    return asyncio.run(consume())
+
+
+def day_numbers_ok(itinerary, duration):
+    return isinstance(itinerary, list) and [day['day'] for day in itinerary] == [str(d) for d in range(1, duration + 1)]
+
+
+@contextlib.contextmanager
+def mode(name):
+    patches = []
+    if name == 'legacy':
+        # The old behaviour: one request with a fixed 4000-token budget, kept however it ends.
+        patches.append(mock.patch.object(OpenAIService, 'itinerary_max_tokens', staticmethod(lambda n_days: 4000)))
+        patches.append(mock.patch.object(
+            OpenAIService, '_itinerary_complete', staticmethod(lambda itinerary, duration, finish_reason: True)
+        ))
+    if name in ('legacy', 'budgeted'):
+        patches.append(mock.patch.object(openai_service, 'ITINERARY_CHUNK_MIN_DAYS', 10 ** 6))
+    with contextlib.ExitStack() as stack:
+        for patch in patches:
+            stack.enter_context(patch)
+        yield
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Itinerary wall-clock time and truncation: one request versus parallel day ranges")
+    parser.add_argument('--durations', type=int, nargs='+', default=[3, 7, 10, 14, 21, 30])
+    parser.add_argument('--ttft', type=float, default=0.3, help="stub time to first token in seconds")
+    parser.add_argument('--tokens-per-second', type=float, default=400.0,
+                        help="stub generation speed (scaled up from ~80 tok/s to keep the run short)")
+    parser.add_argument('--tokens-per-day', type=float, default=160.0, help="stub output tokens per itinerary day")
+    args = parser.parse_args()
+
+    model = StubModel(args.ttft, args.tokens_per_second, args.tokens_per_day)
+    print(f"{'days':>5} {'mode':<9} {'budget':>7} {'requests':>9} {'plan s':>7} {'days ok':>8} "
+          f"{'stream s':>9} {'first day s':>12}")
+
+    for duration in args.durations:
+        for name in ('legacy', 'budgeted', 'chunked'):
+            with mode(name), contextlib.redirect_stdout(io.StringIO()):
+                ranges = OpenAIService.itinerary_chunks(duration) or [(1, duration)]
+                tokens = sum(OpenAIService.itinerary_max_tokens(last - first + 1) for first, last in ranges)
+                elapsed, itinerary = sync_run(model, duration)
+                stream_elapsed, first_day, streamed = async_stream_run(model, duration)
+
+            ok = day_numbers_ok(itinerary, duration) and day_numbers_ok(streamed, duration)
+            print(f"{duration:>5} {name:<9} {tokens:>7} {len(ranges):>9} {elapsed:>7.2f} {str(ok):>8} "
+                  f"{stream_elapsed:>9.2f} {first_day if first_day is not None else float('nan'):>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
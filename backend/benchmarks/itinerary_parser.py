@@ -0,0 +1,206 @@
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.openai_service import ItineraryParser, OpenAIService
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'itinerary_corpus')
+
+
+def legacy_parse_itinerary(text):
+    # The line-by-line parser this module replaced, kept as the reference implementation.
+    itinerary = []
+    current_day = None
+
+    day_pattern = re.compile(r"Day\s+(\d+)\s*[:|-]\s*(.*)", re.IGNORECASE)
+
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        day_match = day_pattern.search(line)
+        if day_match:
+            if current_day:
+                itinerary.append(current_day)
+
+            day_num = day_match.group(1)
+            day_title = day_match.group(2).strip().replace("**", "").replace('": [', '').replace('"', '').replace(":", "")
+
+            current_day = {
+                "day": day_num,
+                "title": day_title,
+                "activities": []
+            }
+            continue
+
+        if current_day and (line.startswith("-") or line.startswith("*") or (len(line) > 1 and line[0].isdigit() and line[1] == '.')):
+
+            clean_line = re.sub(r"^[-*0-9.]+\s*", "", line)
+
+            title = ""
+            time_val = "Anytime"
+            desc = ""
+
+            if ":" in clean_line:
+                parts = clean_line.split(":", 1)
+                potential_time = parts[0].strip().replace("*", "")
+
+                if len(potential_time) < 20:
+                    time_val = potential_time
+                    remainder = parts[1].strip()
+                else:
+                    remainder = clean_line
+            else:
+                remainder = clean_line
+
+            if " - " in remainder:
+                title_desc = remainder.split(" - ", 1)
+                title = title_desc[0].strip().replace("**", "")
+                desc = title_desc[1].strip()
+            elif ": " in remainder:
+                title_desc = remainder.split(": ", 1)
+                title = title_desc[0].strip().replace("**", "")
+                desc = title_desc[1].strip()
+            else:
+                title = remainder.strip().replace("**", "")
+                desc = ""
+
+            if not title:
+                continue
+
+            current_day["activities"].append({
+                "time": time_val,
+                "title": title,
+                "desc": desc
+            })
+
+    if current_day:
+        itinerary.append(current_day)
+
+    if not itinerary:
+        return {"raw_text": text}
+
+    return itinerary
+
+
+def stream_parse(service, text, chunk_size):
+    parser = ItineraryParser()
+    itinerary = []
+    pending = ""
+    for start in range(0, len(text), chunk_size):
+        days, pending = service._feed_delta(parser, pending, text[start:start + chunk_size])
+        itinerary.extend(days)
+    for day in (parser.feed_line(pending), parser.close()):
+        if day:
+            itinerary.append(day)
+    return itinerary or {"raw_text": text}
+
+
+def corpus():
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, '*.txt'))):
+        with open(path, encoding='utf-8', newline='') as f:
+            yield path, f.read()
+
+
+def random_itinerary(rng, n_lines):
+    pieces = [
+        "Day", "day", "DAY", "Days", "Holiday", " ", "  ", "\t", " ", "\r", "1", "12", "2.", "-", " - ", "--",
+        "*", "**", ":", ": ", "|", '"', '": [', "Morning", "Afternoon: ", "Visit the museum", "Lunch",
+        "A very long time label indeed", "²", "café", "–", "\U0001F30D",
+    ]
+    lines = []
+    for _ in range(n_lines):
+        lines.append("".join(rng.choice(pieces) for _ in range(rng.randint(0, 8))))
+    return "\n".join(lines)
+
+
+def check(args):
+    service = OpenAIService()
+    cases = 0
+
+    for path, text in corpus():
+        expected_path = path[:-len('.txt')] + '.json'
+        actual = service._parse_itinerary(text)
+
+        if args.update:
+            with open(expected_path, 'w', encoding='utf-8') as f:
+                json.dump(legacy_parse_itinerary(text), f, indent=2, ensure_ascii=False)
+                f.write('\n')
+
+        with open(expected_path, encoding='utf-8') as f:
+            expected = json.load(f)
+
+        name = os.path.basename(path)
+        if actual != expected:
+            raise SystemExit(f"{name}: parsed itinerary differs from {os.path.basename(expected_path)}")
+        for chunk_size in (1, 7, 64):
+            if stream_parse(service, text, chunk_size) != expected:
+                raise SystemExit(f"{name}: streamed parse with {chunk_size}-character chunks differs")
+        cases += 1
+
+    rng = random.Random(args.seed)
+    for i in range(args.fuzz):
+        text = random_itinerary(rng, rng.randint(1, 30))
+        if service._parse_itinerary(text) != legacy_parse_itinerary(text):
+            raise SystemExit(f"fuzz case {i} differs from the reference parser: {text!r}")
+
+    print(f"{cases} corpus files and {args.fuzz} fuzz cases match the reference parser")
+
+
+def long_itinerary(days):
+    lines = ["Here is your itinerary:", ""]
+    for day in range(1, days + 1):
+        lines.append(f"**Day {day}: Exploring the Old Town and beyond**")
+        lines.append("- Morning: Visit the Cathedral - Explore the Gothic nave and its 14th-century frescoes.")
+        lines.append("- **Afternoon**: Lunch at Mercado Central - Sample local tapas: jamón, olives and more.")
+        lines.append("- Evening: Sunset walk along the river - Enjoy the golden hour views.")
+        lines.append("")
+    lines.append("Enjoy your trip!")
+    return "\n".join(lines)
+
+
+def bench(args):
+    text = long_itinerary(args.days)
+    service = OpenAIService()
+    if service._parse_itinerary(text) != legacy_parse_itinerary(text):
+        raise SystemExit("parsers disagree on the benchmark itinerary")
+
+    results = {}
+    for label, parse in (("legacy", legacy_parse_itinerary), ("compiled", service._parse_itinerary)):
+        best = min(timeit.repeat(lambda: parse(text), number=args.number, repeat=args.repeat)) / args.number
+        results[label] = best
+        print(f"{label:<10} {args.days}-day itinerary ({len(text.splitlines())} lines): {best * 1e6:8.1f}us per parse")
+    print(f"speedup    {results['legacy'] / results['compiled']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Itinerary parser golden corpus and micro-benchmark")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = subparsers.add_parser('check', help="compare against the golden corpus and the reference parser")
+    check_parser.add_argument('--fuzz', type=int, default=5000)
+    check_parser.add_argument('--seed', type=int, default=0)
+    check_parser.add_argument('--update', action='store_true', help="rewrite the expected .json files from the reference parser")
+
+    bench_parser = subparsers.add_parser('bench', help="time the reference and compiled parsers on a long itinerary")
+    bench_parser.add_argument('--days', type=int, default=30)
+    bench_parser.add_argument('--number', type=int, default=500)
+    bench_parser.add_argument('--repeat', type=int, default=7)
+
+    args = parser.parse_args()
+    if args.command == 'check':
+        check(args)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
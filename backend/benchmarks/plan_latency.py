@@ -0,0 +1,115 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+STUB_ITINERARY = [
+    {"day": "1", "title": "Arrival", "activities": [{"time": "Morning", "title": "Check in", "desc": ""}]}
+]
+STUB_HOTELS = [
+    {"name": "Stub Hotel", "rating": 9.0, "image": None, "hotel_id": 1, "booking_url": "https://example.com"}
+]
+
+
+class StubLatency:
+    def __init__(self, mean, jitter, rng):
+        self.mean = mean
+        self.jitter = jitter
+        self.rng = rng
+
+    def sleep(self):
+        time.sleep(max(0.0, self.mean + self.rng.uniform(-self.jitter, self.jitter)))
+
+
+def install_stubs(app_module, llm, geo, hotels):
+    def get_itinerary(*args, **kwargs):
+        llm.sleep()
+        return STUB_ITINERARY
+
+    def get_geo_id(city):
+        geo.sleep()
+        return {"dest_id": "-1"}
+
+    def get_hotels(dest_id, check_in, check_out):
+        hotels.sleep()
+        return STUB_HOTELS
+
+    app_module.openai_service.get_itinerary = get_itinerary
+    app_module.tripadvisor.get_geo_id = get_geo_id
+    app_module.tripadvisor.get_hotels = get_hotels
+
+
+def serial_plan(app_module):
+    app_module.openai_service.get_itinerary("Paris, France", {}, 5, "2026-06-01", "2026-06-06")
+    app_module.find_hotels("Paris, France", "2026-06-01", "2026-06-06")
+
+
+def run(label, call, n_requests, concurrency):
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        result = call()
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(f"{label:<22} p50 {np.percentile(latencies, 50):8.1f} ms   p99 {np.percentile(latencies, 99):8.1f} ms   "
+          f"{n_requests / elapsed:7.1f} req/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs concurrent /api/plan latency against stub upstreams")
+    parser.add_argument('--llm-latency', type=float, default=2.0)
+    parser.add_argument('--geo-latency', type=float, default=0.3)
+    parser.add_argument('--hotels-latency', type=float, default=1.2)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--hotels-timeout', type=float, default=None)
+    parser.add_argument('--itinerary-timeout', type=float, default=None)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    import app as app_module
+
+    if args.hotels_timeout is not None:
+        app_module.HOTELS_TIMEOUT = args.hotels_timeout
+    if args.itinerary_timeout is not None:
+        app_module.ITINERARY_TIMEOUT = args.itinerary_timeout
+
+    rng = np.random.default_rng(0)
+    install_stubs(
+        app_module,
+        StubLatency(args.llm_latency, args.jitter, rng),
+        StubLatency(args.geo_latency, args.jitter, rng),
+        StubLatency(args.hotels_latency, args.jitter, rng),
+    )
+
+    client = app_module.app.test_client()
+    body = {"city": "Paris, France", "duration": 5, "startDate": "2026-06-01"}
+
+    print(f"stub latency: llm {args.llm_latency}s, geo {args.geo_latency}s, hotels {args.hotels_latency}s "
+          f"(+/- {args.jitter}s); timeouts: itinerary {app_module.ITINERARY_TIMEOUT}s, hotels {app_module.HOTELS_TIMEOUT}s")
+
+    run("serial chains", lambda: serial_plan(app_module), args.requests, args.concurrency)
+    responses = run("/api/plan concurrent", lambda: client.post('/api/plan', json=body), args.requests, args.concurrency)
+
+    partial = sum(1 for r in responses if r.get_json().get("partial"))
+    print(f"partial responses: {partial}/{len(responses)}")
+
+
+if __name__ == '__main__':
+    main()
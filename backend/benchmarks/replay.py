@@ -0,0 +1,230 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import stub_upstreams
+from common import percentile
+from synthetic import DURATIONS, INTERESTS, MONTHS
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'destinai_final_dataset.csv')
+FALLBACK_CITIES = ["Paris, France", "Lisbon, Portugal", "Kyoto, Japan", "Cusco, Peru", "Cape Town, South Africa"]
+DEFAULT_MIX = "plan=3,plan_stream=3,recommend=6,lucky=2,review_summary=1"
+PATH_TEMPLATES = [(re.compile(r"^/api/reviews/.+/summary$"), "/api/reviews/<city>/summary")]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in REQUEST_BUILDERS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{name}', expected one of {sorted(REQUEST_BUILDERS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def load_cities():
+    try:
+        with open(DATASET_PATH, newline='', encoding='utf-8') as f:
+            cities = [row['city'] for row in csv.DictReader(f) if row.get('city')]
+    except (OSError, KeyError):
+        cities = []
+    return cities or FALLBACK_CITIES
+
+
+def random_preferences(rng):
+    return {
+        'ideal_durations': rng.choice(DURATIONS),
+        'best_months': [rng.choice(MONTHS)],
+        'budget_levl': rng.randint(1, 3),
+        **{name: int(rng.random() < 0.35) for name in INTERESTS},
+    }
+
+
+def plan_body(rng, cities, cold):
+    return {
+        "city": rng.choice(cities),
+        "duration": rng.choice([3, 5, 7, 10]),
+        "startDate": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "preferences": random_preferences(rng),
+        # A unique note makes every itinerary a cache miss.
+        "userInput": f"replay {rng.random():.12f}" if cold else ""
+    }
+
+
+REQUEST_BUILDERS = {
+    'plan': lambda rng, cities, cold: ('POST', '/api/plan', plan_body(rng, cities, cold)),
+    'plan_stream': lambda rng, cities, cold: ('POST', '/api/plan/stream', plan_body(rng, cities, cold)),
+    'recommend': lambda rng, cities, cold: ('POST', '/api/recommend', {"preferences": random_preferences(rng)}),
+    'lucky': lambda rng, cities, cold: ('GET', '/api/lucky', None),
+    'review_summary': lambda rng, cities, cold: ('GET', f"/api/reviews/{rng.choice(cities)}/summary", None),
+}
+
+
+def synthetic_requests(mix, n_requests, cities, cold, rng):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    return [
+        dict(zip(('method', 'path', 'body'), REQUEST_BUILDERS[rng.choices(names, weights)[0]](rng, cities, cold)))
+        for _ in range(n_requests)
+    ]
+
+
+def read_requests(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def endpoint(entry):
+    path = entry['path'].split('?')[0]
+    for pattern, template in PATH_TEMPLATES:
+        if pattern.match(path):
+            path = template
+    return f"{entry.get('method', 'GET')} {path}"
+
+
+def local_sender():
+    # Import the app only now, after the environment points it at the stubs.
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+    client = app_module.app.test_client()
+
+    def send(entry):
+        response = client.open(entry['path'], method=entry.get('method', 'GET'), json=entry.get('body'))
+        body = response.get_data()
+        return response.status_code, len(body)
+
+    return send, app_module
+
+
+def remote_sender(target):
+    local = threading.local()
+
+    def send(entry):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.request(
+            entry.get('method', 'GET'), target.rstrip('/') + entry['path'], json=entry.get('body'), timeout=300
+        )
+        return response.status_code, len(response.content)
+
+    return send
+
+
+def replay(send, entries, concurrency):
+    results = []
+    lock = threading.Lock()
+
+    def run(entry):
+        started = time.perf_counter()
+        try:
+            status, size = send(entry)
+        except Exception as e:
+            status, size = repr(e), 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            results.append((endpoint(entry), status, elapsed, size))
+
+    started = time.perf_counter()
+    # A closed loop: each worker sends its next request as soon as the previous one returns.
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, entries))
+    return time.perf_counter() - started, results
+
+
+def report(elapsed, results):
+    print(f"{'endpoint':<34} {'count':>6} {'errors':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8}")
+
+    groups = {}
+    for name, status, seconds, size in results:
+        groups.setdefault(name, []).append((status, seconds))
+    groups['all'] = [(status, seconds) for _, status, seconds, _ in results]
+
+    for name, samples in sorted(groups.items(), key=lambda item: item[0] == 'all'):
+        latencies = [seconds for _, seconds in samples]
+        errors = sum(1 for status, _ in samples if not isinstance(status, int) or status >= 400)
+        print(f"{name:<34} {len(samples):>6} {errors:>6} {len(samples) / elapsed:>7.1f} "
+              f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.95) * 1000:>8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>8.1f} {max(latencies) * 1000:>8.1f}")
+    print(f"{len(results)} requests in {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded or synthetic request mixes against the backend, with local upstream stubs"
+    )
+    parser.add_argument('--requests-file', help="JSONL file of {\"method\", \"path\", \"body\"} requests to replay")
+    parser.add_argument('--write-requests', help="save the generated request mix to this JSONL file")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"relative weights of the synthetic request kinds (default {DEFAULT_MIX})")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--cold', action='store_true', help="make every plan request miss the itinerary cache")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target', help="base URL of a running backend (default: the app in-process)")
+    parser.add_argument('--upstream', help="base URL of already-running stubs (default: start them in-process)")
+    stub_upstreams.add_arguments(parser)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = random.Random(args.seed)
+
+    if args.requests_file:
+        entries = read_requests(args.requests_file)
+    else:
+        entries = synthetic_requests(args.mix, args.requests, load_cities(), args.cold, rng)
+    if args.write_requests:
+        with open(args.write_requests, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+
+    server = None
+    if args.target:
+        # The remote backend must already be configured with OPENAI_API_BASE and RAPIDAPI_BASE_URL.
+        send = remote_sender(args.target)
+    else:
+        upstream = args.upstream
+        if upstream is None:
+            if args.stub_seed is None:
+                args.stub_seed = args.seed
+            server = stub_upstreams.start_server(stub_upstreams.state_from_args(args))
+            upstream = f"http://127.0.0.1:{server.server_address[1]}"
+        os.environ.update({
+            "OPENAI_API_BASE": f"{upstream}/v1",
+            "RAPIDAPI_BASE_URL": f"{upstream}/api/v1/hotels",
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "stub",
+            "T_API_KEY": os.getenv("T_API_KEY") or "stub",
+            "HOST": os.getenv("HOST") or "127.0.0.1",
+            "CITY_BRIEF_PREWARM": "0",
+        })
+        send, _ = local_sender()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed, results = replay(send, entries, args.concurrency)
+    report(elapsed, results)
+
+    if server is not None:
+        stats = server.RequestHandlerClass.state.stats()
+        print("upstream calls: " + ", ".join(
+            f"{route} {count} ({stats['errors'][route]} failed)" for route, count in stats['requests'].items()
+        ))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import StubResponse
+from services.singleflight import SingleFlight
+
+ITINERARY_TEXT = "\n".join(
+    f"Day {d}: Day {d} in the city\n- Morning: Museum - Art.\n- Afternoon: Market - Food.\n- Evening: Bar - Drinks."
+    for d in range(1, 6)
+)
+
+
+class StubUpstreams:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        with self._lock:
+            self.calls[endpoint] += 1
+        time.sleep(self.latency)
+
+        if endpoint == 'completions':
+            return StubResponse({'choices': [{'message': {'content': ITINERARY_TEXT}}]})
+        if endpoint == 'searchDestination':
+            return StubResponse({'status': True, 'data': [{'dest_id': '-1'}]})
+        if endpoint == 'searchHotels':
+            hotels = [{'property': {'name': f'Hotel {i}', 'reviewScore': 8.5, 'photoUrls': [], 'id': i}} for i in range(5)]
+            return StubResponse({'data': {'hotels': hotels}})
+        return StubResponse({'data': {'url': f"https://example.com/hotel/{params['hotel_id']}"}})
+
+
+class NoCoalescing:
+    def do(self, key, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    def stats(self):
+        return {}
+
+
+def reset(app_module):
+    app_module.openai_service.itinerary_cache.clear()
+    app_module.tripadvisor.geo_cache.clear()
+    app_module.tripadvisor.hotel_cache.clear()
+
+
+def burst(app_module, n_requests):
+    client = app_module.app.test_client()
+    barrier = threading.Barrier(n_requests)
+    body = {"city": "Lisbon, Portugal", "duration": 5, "startDate": "2026-07-01", "userInput": "food"}
+
+    def send(_):
+        barrier.wait()
+        return client.post('/api/plan', json=body).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_requests) as pool:
+        statuses = list(pool.map(send, range(n_requests)))
+    return time.perf_counter() - start, Counter(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstream call counts for a burst of identical /api/plan requests")
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as app_module
+
+    app_module.plan_executor = ThreadPoolExecutor(max_workers=2 * args.requests)
+
+    for label, factory in (("without coalescing", NoCoalescing), ("with single-flight", SingleFlight)):
+        reset(app_module)
+        app_module.openai_service.flights = factory()
+        app_module.tripadvisor.flights = factory()
+
+        upstreams = StubUpstreams(args.latency)
+        stub = lambda session, *a, **kw: upstreams.request(*a, **kw)
+        with mock.patch.object(requests.Session, 'request', stub), contextlib.redirect_stdout(io.StringIO()):
+            elapsed, statuses = burst(app_module, args.requests)
+
+        calls = ", ".join(f"{name} {count}" for name, count in sorted(upstreams.calls.items()))
+        print(f"{label:<20} {args.requests} requests in {elapsed:5.2f}s  statuses {dict(statuses)}  "
+              f"upstream calls: {sum(upstreams.calls.values())} ({calls})")
+
+
+if __name__ == '__main__':
+    main()
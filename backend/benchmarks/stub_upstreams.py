@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-ins for the OpenAI chat completions API and the RapidAPI hotel endpoints, returning
+# the response shapes OpenAIService and TripAdvisorService parse. Point the backend at them with
+#   OPENAI_API_BASE=http://127.0.0.1:8099/v1 RAPIDAPI_BASE_URL=http://127.0.0.1:8099/api/v1/hotels
+
+ROUTES = {
+    '/v1/chat/completions': 'openai',
+    '/api/v1/hotels/searchDestination': 'geo',
+    '/api/v1/hotels/searchHotels': 'hotels',
+    '/api/v1/hotels/getHotelDetails': 'details',
+}
+DEFAULT_LATENCY = {'openai': 'lognormal:0.8,0.4', 'geo': 'lognormal:0.15,0.3',
+                   'hotels': 'lognormal:0.4,0.3', 'details': 'lognormal:0.2,0.4'}
+RANGE_PATTERN = re.compile(r"Create days (\d+) to (\d+)")
+TRIP_PATTERN = re.compile(r"(\d+)-day trip")
+
+
+def parse_latency(spec):
+    # "fixed:S", "uniform:LOW,HIGH" or "lognormal:MEDIAN,SIGMA", all in seconds.
+    kind, _, raw = spec.partition(':')
+    values = [float(v) for v in raw.split(',') if v]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: values[0] * rng.lognormvariate(0.0, values[1])
+    raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec}")
+
+
+def itinerary_text(prompt):
+    match = RANGE_PATTERN.search(prompt)
+    if match:
+        first, last = int(match.group(1)), int(match.group(2))
+    else:
+        trip = TRIP_PATTERN.search(prompt)
+        first, last = 1, int(trip.group(1)) if trip else 5
+
+    lines = []
+    for day in range(first, last + 1):
+        lines.append(f"Day {day}: Neighbourhoods and food, part {day}")
+        lines.append(f"- Morning: Old town walk {day} - Wander the historic lanes before the crowds arrive.")
+        lines.append(f"- Afternoon: Market lunch {day} - Try the regional specialities at the covered market.")
+        lines.append(f"- Evening: Riverside dinner {day} - Watch the sunset from a terrace by the water.")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def completion_text(payload):
+    prompt = payload['messages'][-1]['content']
+    if prompt.startswith("Write a short"):
+        return "A city of light, food and music. Come for a weekend and stay for a week."
+    return itinerary_text(prompt)
+
+
+class StubState:
+    def __init__(self, latency, error_rates, error_status=503, tokens_per_second=80.0, seed=None):
+        self.latency = latency
+        self.error_rates = error_rates
+        self.error_status = error_status
+        self.tokens_per_second = tokens_per_second
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {route: 0 for route in DEFAULT_LATENCY}
+        self.errors = {route: 0 for route in DEFAULT_LATENCY}
+
+    def draw(self, route):
+        with self._lock:
+            self.requests[route] += 1
+            delay = max(0.0, self.latency[route](self._rng))
+            failed = self._rng.random() < self.error_rates.get(route, 0.0)
+            if failed:
+                self.errors[route] += 1
+        return delay, failed
+
+    def stats(self):
+        with self._lock:
+            return {"requests": dict(self.requests), "errors": dict(self.errors)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self._send_json(200, self.state.stats())
+            return None, None
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send_json(404, {"error": f"No stub for {url.path}"})
+            return None, None
+
+        delay, failed = self.state.draw(route)
+        if failed:
+            time.sleep(delay)
+            self._send_json(self.state.error_status, {"error": "stub upstream failure"})
+            return None, None
+        return route, (delay, {key: values[0] for key, values in parse_qs(url.query).items()})
+
+    def do_GET(self):
+        route, drawn = self._route()
+        if route is None:
+            return
+        delay, params = drawn
+        time.sleep(delay)
+
+        if route == 'geo':
+            city = params.get('query', '')
+            self._send_json(200, {"status": True, "data": [{"dest_id": str(abs(hash(city)) % 10 ** 6), "search_type": "city"}]})
+        elif route == 'hotels':
+            hotels = [
+                {"property": {
+                    "name": f"Stub Hotel {i} ({params.get('dest_id', '')})",
+                    "reviewScore": round(7 + i * 0.4, 1),
+                    "photoUrls": [f"https://example.com/hotels/{i}.jpg"],
+                    "id": int(params.get('dest_id', 0) or 0) * 10 + i
+                }}
+                for i in range(6)
+            ]
+            self._send_json(200, {"status": True, "data": {"hotels": hotels}})
+        elif route == 'details':
+            self._send_json(200, {"status": True, "data": {"url": f"https://example.com/book/{params.get('hotel_id', '')}"}})
+        else:
+            self._send_json(405, {"error": "Use POST"})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        route, drawn = self._route()
+        if route is None:
+            return
+        if route != 'openai':
+            self._send_json(405, {"error": "Use GET"})
+            return
+
+        delay, _ = drawn
+        text = completion_text(payload)
+        seconds_per_char = 1.0 / (4 * self.state.tokens_per_second)
+
+        if not payload.get('stream'):
+            time.sleep(delay + len(text) * seconds_per_char)
+            self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(delay)
+        try:
+            for start in range(0, len(text), 24):
+                piece = text[start:start + 24]
+                time.sleep(len(piece) * seconds_per_char)
+                self._write_chunk(f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing idle keep-alive connections is normal under load.
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def add_arguments(parser):
+    for route in DEFAULT_LATENCY:
+        parser.add_argument(f'--{route}-latency', type=parse_latency, default=parse_latency(DEFAULT_LATENCY[route]),
+                            help=f"latency distribution for {route} (default {DEFAULT_LATENCY[route]})")
+        parser.add_argument(f'--{route}-errors', type=float, default=0.0, help=f"fraction of {route} calls that fail")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--tokens-per-second', type=float, default=80.0, help="completion streaming speed")
+    parser.add_argument('--stub-seed', type=int, default=None)
+
+
+def state_from_args(args):
+    return StubState(
+        latency={route: getattr(args, f'{route}_latency') for route in DEFAULT_LATENCY},
+        error_rates={route: getattr(args, f'{route}_errors') for route in DEFAULT_LATENCY},
+        error_status=args.error_status,
+        tokens_per_second=args.tokens_per_second,
+        seed=args.stub_seed
+    )
+
+
+def start_server(state, host='127.0.0.1', port=0):
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = StubServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="stub-upstreams", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-ins for the OpenAI and RapidAPI hotel endpoints")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(state_from_args(args), args.host, args.port)
+    base = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Stub upstreams listening on {base}")
+    print(f"  OPENAI_API_BASE={base}/v1 RAPIDAPI_BASE_URL={base}/api/v1/hotels")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(server.RequestHandlerClass.state.stats()))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
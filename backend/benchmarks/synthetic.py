@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import percentile, rss_bytes
+from model.artifact import export_artifact
+from model.recommender import Recommender
+
+INTERESTS = ['culture', 'adventure', 'nature', 'beaches', 'nightlife', 'cuisine', 'wellness', 'urban', 'seclusion']
+DURATIONS = [["Shorttrip"], ["Longtrip"], ["Shorttrip", "Longtrip"]]
+MONTHS = ['%02d' % m for m in range(1, 13)]
+
+
+def season(rng):
+    start = int(rng.integers(0, 12))
+    return [MONTHS[(start + offset) % 12] for offset in range(int(rng.integers(1, 7)))]
+
+
+def synthetic_dataset(n_rows, rng):
+    rows = []
+    for i in range(n_rows):
+        rows.append({
+            'id': i + 1,
+            'city': f"City {i}, Country {i % 97}",
+            'city_photo': f"https://example.com/cities/{i}.jpg",
+            'short_description': f"Synthetic destination number {i}",
+            'latitude': float(rng.uniform(-60, 60)),
+            'longitude': float(rng.uniform(-180, 180)),
+            'avg_temp_monthly': json.dumps({month: round(float(rng.uniform(-5, 35)), 1) for month in MONTHS}),
+            'ideal_durations': json.dumps(DURATIONS[int(rng.integers(0, len(DURATIONS)))]),
+            'best_months': json.dumps(sorted(season(rng))),
+            'budget_levl': int(rng.integers(1, 4)),
+            **{name: int(rng.random() < 0.35) for name in INTERESTS},
+        })
+    return pd.DataFrame(rows)
+
+
+def synthetic_preferences(n_queries, rng):
+    preferences = []
+    for _ in range(n_queries):
+        preferences.append({
+            'ideal_durations': DURATIONS[int(rng.integers(0, len(DURATIONS)))],
+            'best_months': season(rng),
+            'budget_levl': int(rng.integers(1, 4)),
+            **{name: int(rng.random() < 0.35) for name in INTERESTS},
+        })
+    return preferences
+
+
+def fit_pipeline(dataset):
+    # Same layout as the shipped destinai_model.pkl: the recommender reads the
+    # preprocessor's transformers and the classifier's _fit_X and train_cities.
+    preprocessor = ColumnTransformer(transformers=[
+        ('durations_tfidf', TfidfVectorizer(), 'ideal_durations'),
+        ('months_tfidf', TfidfVectorizer(), 'best_months'),
+        ('numeric_scaler', StandardScaler(), ['budget_levl']),
+        ('binary_passthrough', 'passthrough', INTERESTS),
+    ])
+    pipeline = Pipeline([('preprocessor', preprocessor), ('classifier', KNeighborsClassifier(n_neighbors=1))])
+    pipeline.fit(dataset, dataset['city'])
+    pipeline.named_steps['classifier'].train_cities = dataset['city'].tolist()
+    return pipeline
+
+
+def write_fixture(n_rows, out_dir, seed):
+    dataset = synthetic_dataset(n_rows, np.random.default_rng(seed))
+    model_path = os.path.join(out_dir, f'model_{n_rows}.pkl')
+    dataset_path = os.path.join(out_dir, f'dataset_{n_rows}.csv')
+    joblib.dump(fit_pipeline(dataset), model_path)
+    dataset.to_csv(dataset_path, index=False)
+    return model_path, dataset_path
+
+
+def timed(call, *args):
+    started = time.perf_counter()
+    call(*args)
+    return time.perf_counter() - started
+
+
+def run_single(recommender, queries, k):
+    started = time.perf_counter()
+    latencies = [timed(recommender.get_recommendations, query, k) for query in queries]
+    return len(queries), time.perf_counter() - started, latencies
+
+
+def run_batch(recommender, queries, k, batch_size):
+    batches = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    started = time.perf_counter()
+    latencies = [timed(recommender.get_recommendations_batch, batch, k) for batch in batches]
+    return len(queries), time.perf_counter() - started, latencies
+
+
+def run_concurrent(recommender, queries, k, threads):
+    start_gate = threading.Barrier(threads + 1)
+
+    def warm(_):
+        start_gate.wait()
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        # Start every worker before the clock so thread creation is not measured.
+        waiting = [pool.submit(warm, i) for i in range(threads)]
+        start_gate.wait()
+        for future in waiting:
+            future.result()
+
+        started = time.perf_counter()
+        latencies = list(pool.map(lambda query: timed(recommender.get_recommendations, query, k), queries))
+        elapsed = time.perf_counter() - started
+
+    return len(queries), elapsed, latencies
+
+
+def peak_allocated(call, *args):
+    tracemalloc.start()
+    try:
+        call(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(size, source, backend, mode, result, peak):
+    n_queries, elapsed, latencies = result
+    print(f"{size:>8} {source:<9} {backend:<6} {mode:<16} {n_queries / elapsed:>10.0f} "
+          f"{percentile(latencies, 0.5) * 1000:>8.3f} {percentile(latencies, 0.99) * 1000:>8.3f} "
+          f"{peak / 2**20:>9.2f}")
+
+
+def bench_recommender(args, size, source, backend, recommender, queries):
+    k = args.k
+    report(size, source, backend, "single", run_single(recommender, queries, k),
+           peak_allocated(recommender.get_recommendations, queries[0], k))
+
+    for batch_size in args.batch_sizes:
+        report(size, source, backend, f"batch {batch_size}", run_batch(recommender, queries, k, batch_size),
+               peak_allocated(recommender.get_recommendations_batch, queries[:batch_size], k))
+
+    for threads in args.threads:
+        report(size, source, backend, f"{threads} threads", run_concurrent(recommender, queries, k, threads),
+               peak_allocated(recommender.get_recommendations, queries[0], k))
+
+
+def load(model_path, dataset_path, backend, artifact_dir=None):
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommender = Recommender(model_path, dataset_path, index_backend=backend, artifact_dir=artifact_dir)
+    return recommender, time.perf_counter() - started, rss_bytes() - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput, latency and memory of the recommender on synthetic city datasets"
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[32, 256])
+    parser.add_argument('--threads', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--backends', nargs='+', default=['exact', 'ivf'], choices=['exact', 'ivf'])
+    parser.add_argument('--artifact', action='store_true', help="also load each dataset through an exported artifact")
+    parser.add_argument('--keep', metavar='DIR', help="write the generated model and dataset files to DIR and keep them")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    queries = synthetic_preferences(args.queries, np.random.default_rng(args.seed + 1))
+
+    with contextlib.ExitStack() as stack:
+        out_dir = args.keep or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(out_dir, exist_ok=True)
+
+        loads = []
+        print(f"{'rows':>8} {'source':<9} {'index':<6} {'mode':<16} {'queries/s':>10} "
+              f"{'p50 ms':>8} {'p99 ms':>8} {'alloc MiB':>9}")
+
+        for size in args.sizes:
+            started = time.perf_counter()
+            model_path, dataset_path = write_fixture(size, out_dir, args.seed)
+            fit_seconds = time.perf_counter() - started
+
+            sources = [('pickle', None)]
+            if args.artifact:
+                artifact_dir = os.path.join(out_dir, f'artifact_{size}')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    export_artifact(Recommender(model_path, dataset_path), artifact_dir)
+                sources.append(('artifact', artifact_dir))
+
+            for source, artifact_dir in sources:
+                for backend in args.backends:
+                    recommender, load_seconds, load_rss = load(model_path, dataset_path, backend, artifact_dir)
+                    loads.append((size, source, backend, fit_seconds, load_seconds, load_rss))
+                    bench_recommender(args, size, source, backend, recommender, queries)
+                    del recommender
+
+        print()
+        print(f"{'rows':>8} {'source':<9} {'index':<6} {'fit s':>8} {'load s':>8} {'load RSS MiB':>13}")
+        for size, source, backend, fit_seconds, load_seconds, load_rss in loads:
+            print(f"{size:>8} {source:<9} {backend:<6} {fit_seconds:>8.2f} {load_seconds:>8.3f} {load_rss / 2**20:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import percentile
+from model.recommender import Recommender
+from model.topk_table import build_table, frequent_profiles, read_preference_log
+from synthetic import synthetic_preferences, write_fixture
+
+
+def zipf_traffic(pool, n_requests, exponent, rng):
+    # A few thousand profiles dominate real traffic; rank r is drawn with probability ~ 1 / r**exponent.
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** exponent
+    picks = rng.choice(len(pool), size=n_requests, p=weights / weights.sum())
+    return [pool[i] for i in picks]
+
+
+def replay(recommender, traffic, k):
+    latencies = []
+    for preferences in traffic:
+        started = time.perf_counter()
+        recommender.get_recommendations(preferences, k)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def cities(recommender, preferences, k):
+    return [r['city'] for r in recommender.get_recommendations(preferences, k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hit rate, memory and latency of the precomputed top-k table")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--profiles', type=int, default=50000, help="distinct profiles in the synthetic traffic")
+    parser.add_argument('--requests', type=int, default=20000, help="requests in each of the log and replay halves")
+    parser.add_argument('--exponent', type=float, default=1.1)
+    parser.add_argument('--top', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--table-k', type=int, default=10)
+    parser.add_argument('--verify', type=int, default=2000, help="distinct profiles checked against the live search")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(args.seed + 1)
+    pool = synthetic_preferences(args.profiles, rng)
+    logged = zipf_traffic(pool, args.requests, args.exponent, rng)
+    traffic = zipf_traffic(pool, args.requests, args.exponent, rng)
+    distinct = list({json.dumps(p, sort_keys=True): p for p in traffic}.values())[:args.verify]
+
+    print(f"{'rows':>8} {'top':>7} {'entries':>8} {'MiB':>7} {'build s':>8} {'log cover':>10} {'hit rate':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'live p50':>9} {'live p99':>9} {'verified':>9}")
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        log_path = os.path.join(out_dir, 'preferences.jsonl')
+        with open(log_path, 'w', encoding='utf-8') as f:
+            for preferences in logged:
+                f.write(json.dumps({"preferences": preferences}) + "\n")
+
+        for size in args.sizes:
+            model_path, dataset_path = write_fixture(size, out_dir, args.seed)
+            with contextlib.redirect_stdout(io.StringIO()):
+                recommender = Recommender(model_path, dataset_path)
+
+            live = replay(recommender, traffic, args.k)
+            expected = [cities(recommender, preferences, args.k) for preferences in distinct]
+
+            for top in args.top:
+                started = time.perf_counter()
+                profiles, covered, total = frequent_profiles(recommender, read_preference_log(log_path), top)
+                recommender.topk_table = build_table(recommender, profiles, args.table_k)
+                build_seconds = time.perf_counter() - started
+
+                latencies = replay(recommender, traffic, args.k)
+                stats = recommender.topk_table.stats()
+
+                # A table hit must return exactly the cities, in order, that the live search would.
+                verified = 0
+                for preferences, live_cities in zip(distinct, expected):
+                    if recommender.topk_table.lookup(recommender.preference_key(preferences), args.k) is None:
+                        continue
+                    verified += 1
+                    table_cities = cities(recommender, preferences, args.k)
+                    if table_cities != live_cities:
+                        raise SystemExit(f"top-k table returned {table_cities} where the live search returned "
+                                         f"{live_cities} for {preferences}")
+
+                print(f"{size:>8} {top:>7} {stats['entries']:>8} {stats['bytes'] / 2**20:>7.2f} {build_seconds:>8.2f} "
+                      f"{covered / total:>10.1%} {stats['hit_rate']:>9.1%} "
+                      f"{percentile(latencies, 0.5) * 1000:>8.3f} {percentile(latencies, 0.99) * 1000:>8.3f} "
+                      f"{percentile(live, 0.5) * 1000:>9.3f} {percentile(live, 0.99) * 1000:>9.3f} {verified:>9}")
+
+            recommender.topk_table = None
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,9 @@
 
+import argparse
 import socket
 import os
+import subprocess
+import sys
 
 def get_local_ip():
     try:
@@ -12,7 +15,7 @@ def get_local_ip():
     except Exception:
         return "127.0.0.1"
 
-def update_config(ip):
+def update_config(ip, port=5000):
     config_path = os.path.join(os.path.dirname(__file__), "..", "frontend", "js", "config.js")
     
     if not os.path.exists(config_path):
@@ -21,7 +24,7 @@ def update_config(ip):
 
     content = f"""
 const CONFIG = {{
-    API_BASE_URL: "http://{ip}:5000"
+    API_BASE_URL: "http://{ip}:{port}"
 }};
 """
     with open(config_path, "w") as f:
@@ -29,15 +32,15 @@ const CONFIG = {{
     
     print(f"✅ Updated {config_path} with IP: {ip}")
 
-def print_instructions(ip):
+def print_instructions(ip, port=5000):
     print("\n" + "="*50)
     print(f"🚀 DEPLOYMENT READY!")
     print("="*50)
-    print(f"1. Backend is configured to run on http://0.0.0.0:5000")
-    print(f"2. Frontend config updated to point to http://{ip}:5000")
+    print(f"1. Backend is configured to run on http://0.0.0.0:{port}")
+    print(f"2. Frontend config updated to point to http://{ip}:{port}")
     print("-" * 50)
     print("HOW TO RUN:")
-    print("   Terminal 1 (Backend):  cd backend && python app.py")
+    print("   Terminal 1 (Backend):  cd backend && python serve.py  (or: python app.py for the dev server)")
     print("   Terminal 2 (Frontend): cd frontend && python -m http.server 8000")
     print("-" * 50)
     print("ACCESS LINKS:")
@@ -45,7 +48,39 @@ def print_instructions(ip):
     print(f"   📱 Other Devices: http://{ip}:8000/MainPage.html")
     print("="*50 + "\n")
 
+def run_server(args):
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+    if os.name == 'nt':
+        # gunicorn needs fork(), so Windows falls back to the development server.
+        print("⚠️  Pre-fork server is not available on Windows, starting the development server")
+        command = [sys.executable, os.path.join(backend_dir, "app.py")]
+    else:
+        command = [
+            sys.executable, os.path.join(backend_dir, "serve.py"),
+            "--port", str(args.port),
+            "--workers", str(args.workers),
+            "--threads", str(args.threads)
+        ]
+
+    print(f"▶️  {' '.join(command)}")
+    try:
+        subprocess.run(command, cwd=backend_dir)
+    except KeyboardInterrupt:
+        pass
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Point the frontend at this machine and start the backend")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="server worker processes")
+    parser.add_argument("--threads", type=int, default=16, help="threads per worker process")
+    parser.add_argument("--config-only", action="store_true", help="only update frontend/js/config.js")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     ip = get_local_ip()
-    update_config(ip)
-    print_instructions(ip)
+    update_config(ip, args.port)
+    print_instructions(ip, args.port)
+    if not args.config_only:
+        run_server(args)
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ARTIFACT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+ENCODER_FILE = 'encoder.json'
+MATRIX_FILE = 'training_matrix.npy'
+CITIES_FILE = 'train_cities.json'
+DETAILS_FILE = 'city_details'
+RECORDS_FILE = 'city_records'
+FILTER_KEYS_FILE = 'filter_keys.json'
+FILTER_BITS_FILE = 'filter_bits.npy'
+CITY_IDS_FILE = 'city_ids.npy'
+
+
+class MappedRecords:
+    def __init__(self, blob_path, offsets_path):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        if os.path.getsize(blob_path):
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return json.loads(self.blob[start:stop].tobytes())
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def write_records(path, records):
+    offsets = [0]
+    with open(f"{path}.bin", 'wb') as f:
+        for record in records:
+            encoded = json.dumps(record, ensure_ascii=False, default=str).encode('utf-8')
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(f"{path}.offsets.npy", np.asarray(offsets, dtype=np.int64))
+
+
+def read_records(path):
+    return MappedRecords(f"{path}.bin", f"{path}.offsets.npy")
+
+
+def is_artifact(artifact_dir):
+    return bool(artifact_dir) and os.path.isfile(os.path.join(artifact_dir, MANIFEST_FILE))
+
+
+def is_stale(artifact_dir, *source_paths):
+    manifest_mtime = os.path.getmtime(os.path.join(artifact_dir, MANIFEST_FILE))
+    return any(os.path.isfile(path) and os.path.getmtime(path) > manifest_mtime for path in source_paths)
+
+
+def export_artifact(recommender, artifact_dir):
+    if recommender.encoder is None:
+        raise ValueError("Only pipelines with a compiled feature encoder can be exported")
+
+    classifier = recommender.model.named_steps['classifier']
+    training_matrix = np.ascontiguousarray(classifier._fit_X, dtype=np.float64)
+    train_cities = [str(city) for city in classifier.train_cities]
+
+    if len(train_cities) != len(recommender.city_details):
+        raise ValueError(
+            f"Model has {len(train_cities)} training cities but dataset has {len(recommender.city_details)} rows"
+        )
+
+    os.makedirs(artifact_dir, exist_ok=True)
+    manifest_path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    np.save(os.path.join(artifact_dir, MATRIX_FILE), training_matrix)
+
+    with open(os.path.join(artifact_dir, ENCODER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(recommender.encoder.to_params(), f)
+    with open(os.path.join(artifact_dir, CITIES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(train_cities, f, ensure_ascii=False)
+
+    write_records(os.path.join(artifact_dir, DETAILS_FILE), recommender.city_details)
+    write_records(os.path.join(artifact_dir, RECORDS_FILE), recommender.city_records)
+    np.save(os.path.join(artifact_dir, CITY_IDS_FILE),
+            np.asarray([record['id'] for record in recommender.city_records], dtype=np.int64))
+
+    if recommender.filter_index is not None:
+        np.save(os.path.join(artifact_dir, FILTER_BITS_FILE), recommender.filter_index.bits)
+        with open(os.path.join(artifact_dir, FILTER_KEYS_FILE), 'w', encoding='utf-8') as f:
+            json.dump([list(key) for key in recommender.filter_index.keys], f, ensure_ascii=False)
+
+    # Written last so a half-finished export is never picked up as an artifact.
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'rows': int(training_matrix.shape[0]),
+        'features': int(training_matrix.shape[1]),
+        'model_path': os.path.abspath(recommender.model_path),
+        'dataset_path': os.path.abspath(recommender.dataset_path),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def load_artifact(artifact_dir):
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"Unsupported artifact version {manifest.get('version')} in {artifact_dir}")
+
+    with open(os.path.join(artifact_dir, ENCODER_FILE), encoding='utf-8') as f:
+        encoder_params = json.load(f)
+    with open(os.path.join(artifact_dir, CITIES_FILE), encoding='utf-8') as f:
+        train_cities = json.load(f)
+
+    # Artifacts exported before the filter bitsets existed are still loadable.
+    filters = None
+    if os.path.isfile(os.path.join(artifact_dir, FILTER_KEYS_FILE)):
+        with open(os.path.join(artifact_dir, FILTER_KEYS_FILE), encoding='utf-8') as f:
+            filter_keys = json.load(f)
+        filters = (filter_keys, np.load(os.path.join(artifact_dir, FILTER_BITS_FILE), mmap_mode='r'))
+
+    city_ids = None
+    if os.path.isfile(os.path.join(artifact_dir, CITY_IDS_FILE)):
+        city_ids = np.load(os.path.join(artifact_dir, CITY_IDS_FILE))
+
+    return {
+        'manifest': manifest,
+        'encoder': encoder_params,
+        'training_matrix': np.load(os.path.join(artifact_dir, MATRIX_FILE), mmap_mode='r'),
+        'train_cities': train_cities,
+        'city_details': read_records(os.path.join(artifact_dir, DETAILS_FILE)),
+        'city_records': read_records(os.path.join(artifact_dir, RECORDS_FILE)),
+        'filters': filters,
+        'city_ids': city_ids
+    }
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, base_dir)
+    from model.recommender import Recommender
+
+    parser = argparse.ArgumentParser(description="Export the recommender pipeline to a memory-mappable artifact")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export')
+    export.add_argument('--model', default=os.path.join(base_dir, 'model/destinai_model.pkl'))
+    export.add_argument('--dataset', default=os.path.join(base_dir, 'model/destinai_final_dataset.csv'))
+    export.add_argument('--out', default=os.path.join(base_dir, 'model/artifact'))
+
+    args = parser.parse_args()
+
+    recommender = Recommender(args.model, args.dataset)
+    started = time.perf_counter()
+    manifest = export_artifact(recommender, args.out)
+    print(f"Exported {manifest['rows']} cities x {manifest['features']} features to {args.out} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
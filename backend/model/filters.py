@@ -0,0 +1,54 @@
+import numpy as np
+
+FILTER_FIELDS = ('months', 'durations', 'budget')
+
+
+class InvertedIndex:
+    def __init__(self, n_rows, keys, bits):
+        self.n_rows = n_rows
+        self.keys = [tuple(key) for key in keys]
+        self.bits = bits
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self._all = np.packbits(np.ones(n_rows, dtype=bool))
+
+    @classmethod
+    def build(cls, rows, n_rows):
+        # rows yields (row index, {field: set of values}); each (field, value)
+        # pair gets one bitset with a bit per training city.
+        members = {}
+        for index, fields in rows:
+            for field, values in fields.items():
+                for value in values:
+                    members.setdefault((field, value), []).append(index)
+
+        keys = sorted(members)
+        bits = np.zeros((len(keys), (n_rows + 7) // 8), dtype=np.uint8)
+        for i, key in enumerate(keys):
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[members[key]] = True
+            bits[i] = np.packbits(mask)
+        return cls(n_rows, keys, bits)
+
+    def __len__(self):
+        return self.n_rows
+
+    def nbytes(self):
+        return int(self.bits.nbytes)
+
+    def values(self, field):
+        return sorted(value for f, value in self.keys if f == field)
+
+    def bitset(self, field, values):
+        # A city matches a field when it has any of the requested values.
+        result = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        for value in values:
+            position = self.positions.get((field, value))
+            if position is not None:
+                result |= self.bits[position]
+        return result
+
+    def match(self, constraints):
+        result = self._all.copy()
+        for field, values in constraints.items():
+            result &= self.bitset(field, values)
+        return np.flatnonzero(np.unpackbits(result, count=self.n_rows))
@@ -0,0 +1,202 @@
+import numpy as np
+
+CHUNK_ROWS = 4096
+TIE_DECIMALS = 9
+TIE_TOLERANCE = 10.0 ** -TIE_DECIMALS
+
+
+class ExactIndex:
+    def __init__(self, vectors):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float64)
+        self.sq_norms = row_norms(self.vectors)
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, queries, k, candidates=None):
+        queries = as_queries(queries)
+        if candidates is not None:
+            return subset_search(self.vectors, self.sq_norms, queries, k, candidates)
+
+        k = min(k, len(self))
+
+        distances = np.empty((queries.shape[0], k))
+        indices = np.empty((queries.shape[0], k), dtype=np.intp)
+
+        for start in range(0, queries.shape[0], CHUNK_ROWS):
+            chunk = slice(start, start + CHUNK_ROWS)
+            sq_dist = squared_distances(queries[chunk], self.vectors, self.sq_norms)
+            distances[chunk], indices[chunk] = top_k(sq_dist, k)
+
+        return distances, indices
+
+
+class IVFIndex:
+    def __init__(self, vectors, n_lists=None, n_probe=8, n_iter=15, seed=0):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float64)
+        self.sq_norms = row_norms(self.vectors)
+
+        n_rows = self.vectors.shape[0]
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        self.n_lists = max(1, min(n_lists, n_rows))
+        self.n_probe = max(1, min(n_probe, self.n_lists))
+
+        self.centroids = kmeans(self.vectors, self.n_lists, n_iter, seed)
+        self.centroid_norms = row_norms(self.centroids)
+
+        assignments = nearest_centroid(self.vectors, self.centroids, self.centroid_norms)
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.list_ids = np.argsort(assignments, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def _probe_lists(self, queries):
+        sq_dist = squared_distances(queries, self.centroids, self.centroid_norms)
+        if self.n_probe >= self.n_lists:
+            return np.broadcast_to(np.arange(self.n_lists), sq_dist.shape)
+        return np.argpartition(sq_dist, self.n_probe - 1, axis=1)[:, :self.n_probe]
+
+    def search(self, queries, k, candidates=None):
+        queries = as_queries(queries)
+        allowed = None
+        if candidates is not None:
+            candidates = np.asarray(candidates, dtype=np.intp)
+            # Small candidate sets are cheaper to scan directly than to probe.
+            if len(candidates) <= k or len(candidates) <= CHUNK_ROWS:
+                return subset_search(self.vectors, self.sq_norms, queries, k, candidates)
+            allowed = np.zeros(len(self), dtype=bool)
+            allowed[candidates] = True
+
+        k = min(k, len(self))
+        probes = self._probe_lists(queries)
+
+        distances = np.empty((queries.shape[0], k))
+        indices = np.empty((queries.shape[0], k), dtype=np.intp)
+
+        for row, query in enumerate(queries):
+            probed = np.concatenate([
+                self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes[row]
+            ])
+            if allowed is not None:
+                probed = probed[allowed[probed]]
+            if len(probed) < k:
+                probed = np.arange(len(self)) if allowed is None else candidates
+
+            sq_dist = squared_distances(query[None, :], self.vectors[probed], self.sq_norms[probed])
+            row_distances, local = top_k(sq_dist, k, probed[None, :])
+            distances[row] = row_distances[0]
+            indices[row] = probed[local[0]]
+
+        return distances, indices
+
+
+INDEX_BACKENDS = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+}
+
+
+def build_index(backend, vectors, **options):
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend: {backend}")
+    return INDEX_BACKENDS[backend](vectors, **options)
+
+
+def subset_search(vectors, sq_norms, queries, k, candidates):
+    candidates = np.asarray(candidates, dtype=np.intp)
+    k = min(k, len(candidates))
+
+    distances = np.empty((queries.shape[0], k))
+    indices = np.empty((queries.shape[0], k), dtype=np.intp)
+    if k == 0:
+        return distances, indices
+
+    vectors = vectors[candidates]
+    sq_norms = sq_norms[candidates]
+    for start in range(0, queries.shape[0], CHUNK_ROWS):
+        chunk = slice(start, start + CHUNK_ROWS)
+        sq_dist = squared_distances(queries[chunk], vectors, sq_norms)
+        distances[chunk], local = top_k(sq_dist, k, candidates[None, :])
+        indices[chunk] = candidates[local]
+
+    return distances, indices
+
+
+def as_queries(queries):
+    if hasattr(queries, 'toarray'):
+        queries = queries.toarray()
+    return np.atleast_2d(np.asarray(queries, dtype=np.float64))
+
+
+def row_norms(vectors):
+    return np.einsum('ij,ij->i', vectors, vectors)
+
+
+def squared_distances(queries, vectors, sq_norms):
+    sq_dist = row_norms(queries)[:, None] - 2.0 * (queries @ vectors.T) + sq_norms[None, :]
+    np.maximum(sq_dist, 0.0, out=sq_dist)
+    return sq_dist
+
+
+def top_k(sq_dist, k, ids=None):
+    n_rows, n_cols = sq_dist.shape
+    if ids is None:
+        ids = np.arange(n_cols)
+    ids = np.broadcast_to(ids, sq_dist.shape)
+
+    if k < n_cols:
+        # argpartition keeps an arbitrary subset of the rows tied at the k-th distance, so take
+        # every tied row, order by (distance, id) and only then cut to k. Distances within
+        # TIE_DECIMALS count as equal so float noise between search paths does not break ties.
+        part = np.argpartition(sq_dist, k - 1, axis=1)
+        kth = np.take_along_axis(sq_dist, part[:, k - 1:k], axis=1)
+        within = sq_dist <= kth + TIE_TOLERANCE
+        width = int(within.sum(axis=1).max())
+        if width == k:
+            part = part[:, :k]
+        elif width < n_cols:
+            masked = np.where(within, sq_dist, np.inf)
+            part = np.argpartition(masked, width - 1, axis=1)[:, :width]
+        else:
+            part = np.broadcast_to(np.arange(n_cols), sq_dist.shape)
+    else:
+        part = np.broadcast_to(np.arange(n_cols), sq_dist.shape)
+
+    part_dist = np.take_along_axis(sq_dist, part, axis=1)
+    tie_break = np.take_along_axis(ids, part, axis=1)
+    order = np.lexsort((tie_break, np.round(part_dist, TIE_DECIMALS)), axis=1)[:, :k]
+
+    indices = np.take_along_axis(part, order, axis=1)
+    distances = np.sqrt(np.take_along_axis(part_dist, order, axis=1))
+    return distances, indices
+
+
+def nearest_centroid(vectors, centroids, centroid_norms):
+    assignments = np.empty(vectors.shape[0], dtype=np.intp)
+    for start in range(0, vectors.shape[0], CHUNK_ROWS):
+        chunk = slice(start, start + CHUNK_ROWS)
+        assignments[chunk] = np.argmin(squared_distances(vectors[chunk], centroids, centroid_norms), axis=1)
+    return assignments
+
+
+def kmeans(vectors, n_clusters, n_iter=15, seed=0):
+    rng = np.random.default_rng(seed)
+    n_rows, n_features = vectors.shape
+    centroids = vectors[rng.choice(n_rows, n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assignments = nearest_centroid(vectors, centroids, row_norms(centroids))
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.column_stack([
+            np.bincount(assignments, weights=vectors[:, j], minlength=n_clusters) for j in range(n_features)
+        ])
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = vectors[rng.choice(n_rows, int(empty.sum()), replace=False)]
+
+    return centroids
@@ -1,23 +1,197 @@
 import pandas as pd
+import hashlib
 import joblib
+import json
 import os
+import random
 import re
+import time
 import numpy as np
+from model.artifact import is_artifact, is_stale, load_artifact
+from model.filters import FILTER_FIELDS, InvertedIndex
+from model.index import build_index
+from model.topk_table import TopKTable, fingerprint
+from services.metrics import span
+
+INTERESTS = ['culture', 'adventure', 'nature', 'beaches', 'nightlife', 'cuisine', 'wellness', 'urban', 'seclusion']
+
+class FeatureEncoder:
+    def __init__(self, preprocessor):
+        self.n_features = 0
+        self.steps = []
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop':
+                continue
+
+            output = preprocessor.output_indices_[name]
+            self.n_features = max(self.n_features, output.stop)
+            kind = type(transformer).__name__
+
+            if kind == 'TfidfVectorizer':
+                self.steps.append(('tfidf', columns, output, self._compile_tfidf(transformer)))
+            elif kind == 'StandardScaler':
+                self.steps.append(('scale', list(columns), output, self._compile_scaler(transformer)))
+            elif transformer == 'passthrough' or (kind == 'FunctionTransformer' and transformer.func is None):
+                self.steps.append(('passthrough', list(columns), output, None))
+            else:
+                raise ValueError(f"Cannot compile transformer '{name}' of type {kind}")
+
+    @classmethod
+    def from_params(cls, params):
+        encoder = cls.__new__(cls)
+        encoder.n_features = params['n_features']
+        encoder.steps = []
+
+        for step in params['steps']:
+            kind = step['kind']
+            output = slice(*step['output'])
+            compiled = None
+            if kind == 'tfidf':
+                compiled = dict(step['params'])
+                compiled['pattern'] = re.compile(compiled['pattern'])
+                if compiled['idf'] is not None:
+                    compiled['idf'] = np.asarray(compiled['idf'], dtype=np.float64)
+            elif kind == 'scale':
+                compiled = {key: np.asarray(value, dtype=np.float64) for key, value in step['params'].items()}
+            encoder.steps.append((kind, step['columns'], output, compiled))
+
+        return encoder
+
+    def to_params(self):
+        steps = []
+        for kind, columns, output, compiled in self.steps:
+            params = None
+            if kind == 'tfidf':
+                params = dict(compiled)
+                params['pattern'] = compiled['pattern'].pattern
+                params['vocabulary'] = {token: int(i) for token, i in compiled['vocabulary'].items()}
+                if compiled['idf'] is not None:
+                    params['idf'] = compiled['idf'].tolist()
+            elif kind == 'scale':
+                params = {key: value.tolist() for key, value in compiled.items()}
+            steps.append({
+                'kind': kind,
+                'columns': columns,
+                'output': [output.start, output.stop],
+                'params': params
+            })
+        return {'n_features': self.n_features, 'steps': steps}
+
+    def _compile_tfidf(self, vectorizer):
+        if vectorizer.analyzer != 'word' or vectorizer.ngram_range != (1, 1):
+            raise ValueError("Only word unigram TF-IDF vectorizers can be compiled")
+        if vectorizer.tokenizer is not None or vectorizer.preprocessor is not None or vectorizer.strip_accents is not None:
+            raise ValueError("Custom TF-IDF tokenization cannot be compiled")
+
+        return {
+            'pattern': re.compile(vectorizer.token_pattern),
+            'lowercase': vectorizer.lowercase,
+            'vocabulary': dict(vectorizer.vocabulary_),
+            'idf': vectorizer.idf_.copy() if vectorizer.use_idf else None,
+            'binary': vectorizer.binary,
+            'sublinear_tf': vectorizer.sublinear_tf,
+            'norm': vectorizer.norm
+        }
+
+    def _compile_scaler(self, scaler):
+        n_columns = scaler.n_features_in_
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_columns)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_columns)
+        return {'mean': mean.copy(), 'scale': scale.copy()}
+
+    def _encode_tfidf(self, text, params, out):
+        text = str(text)
+        if params['lowercase']:
+            text = text.lower()
+
+        vocabulary = params['vocabulary']
+        for token in params['pattern'].findall(text):
+            position = vocabulary.get(token)
+            if position is not None:
+                out[position] += 1.0
+
+        counted = out > 0
+        if params['binary']:
+            out[counted] = 1.0
+        if params['sublinear_tf']:
+            out[counted] = np.log(out[counted]) + 1.0
+        if params['idf'] is not None:
+            out *= params['idf']
+
+        if params['norm'] == 'l2':
+            norm = np.sqrt(np.dot(out, out))
+        elif params['norm'] == 'l1':
+            norm = np.abs(out).sum()
+        else:
+            norm = 0.0
+        if norm > 0:
+            out /= norm
+
+    def encode_into(self, row, out):
+        out[:] = 0.0
+        for kind, columns, output, params in self.steps:
+            if kind == 'tfidf':
+                self._encode_tfidf(row[columns], params, out[output])
+            elif kind == 'scale':
+                values = np.array([row[c] for c in columns], dtype=np.float64)
+                out[output] = (values - params['mean']) / params['scale']
+            else:
+                out[output] = [row[c] for c in columns]
+        return out
+
+    def encode(self, row):
+        return self.encode_into(row, np.zeros(self.n_features))
+
+    def encode_many(self, rows):
+        matrix = np.zeros((len(rows), self.n_features))
+        for i, row in enumerate(rows):
+            self.encode_into(row, matrix[i])
+        return matrix
 
 class Recommender:
-    def __init__(self, model_path, dataset_path):
+    def __init__(self, model_path, dataset_path, index_backend='exact', index_options=None, artifact_dir=None,
+                 topk_table_path=None):
         self.model_path = model_path
         self.dataset_path = dataset_path
+        self.artifact_dir = artifact_dir
+        self.topk_table_path = topk_table_path
+        self.index_backend = index_backend
+        self.index_options = index_options or {}
         self.model = None
+        self.encoder = None
+        self.index = None
+        self.filter_index = None
+        self.topk_table = None
         self.dataset = None
+        self.train_cities = []
+        self.city_details = []
+        self.city_records = []
+        self.city_ids = {}
+        self._city_payloads = {}
+        self._rng = random.Random()
         self.MONTH_MAP = {
             '01': 'January', '02': 'February', '03': 'March', '04': 'April',
             '05': 'May', '06': 'June', '07': 'July', '08': 'August',
             '09': 'September', '10': 'October', '11': 'November', '12': 'December'
         }
+        self.MONTH_NUMBERS = {name.lower(): number for number, name in self.MONTH_MAP.items()}
         self.load_resources()
 
     def load_resources(self):
+        self.load_model()
+        self.load_topk_table()
+
+    def load_model(self):
+        if is_artifact(self.artifact_dir) and is_stale(self.artifact_dir, self.model_path, self.dataset_path):
+            print(f"Artifact in {self.artifact_dir} is older than the model or dataset, loading those instead")
+        elif is_artifact(self.artifact_dir):
+            try:
+                self.load_artifact()
+                return
+            except Exception as e:
+                print(f"Error loading artifact from {self.artifact_dir}, falling back to model and dataset: {e}")
+
         try:
             self.model = joblib.load(self.model_path)
             print(f"Model loaded from {self.model_path}")
@@ -25,15 +199,123 @@ class Recommender:
             print(f"Error loading model: {e}")
             raise
 
+        try:
+            self.encoder = FeatureEncoder(self.model.named_steps['preprocessor'])
+        except Exception as e:
+            print(f"Feature encoder unavailable, using preprocessor.transform: {e}")
+            self.encoder = None
+
+        try:
+            classifier = self.model.named_steps['classifier']
+            self.train_cities = classifier.train_cities
+            self.index = build_index(self.index_backend, classifier._fit_X, **self.index_options)
+            print(f"Built {self.index_backend} index over {len(self.index)} cities")
+        except Exception as e:
+            print(f"Error building index: {e}")
+            raise
+
         try:
             self.dataset = pd.read_csv(self.dataset_path)
             self.dataset.dropna(subset=['city'], inplace=True)
             self.dataset = self.dataset.reset_index(drop=True)
+            self.city_details = self._build_city_details(self.dataset)
+            self.city_records = self._build_city_records(self.city_details)
+            self.city_ids = self._build_city_ids([record["id"] for record in self.city_records])
+            self.filter_index = self._build_filter_index(self.city_details)
             print(f"Dataset loaded from {self.dataset_path}")
         except Exception as e:
             print(f"Error loading dataset: {e}")
             raise
 
+    def load_artifact(self):
+        started = time.perf_counter()
+        artifact = load_artifact(self.artifact_dir)
+
+        self.encoder = FeatureEncoder.from_params(artifact['encoder'])
+        self.train_cities = artifact['train_cities']
+        self.city_details = artifact['city_details']
+        self.city_records = artifact['city_records']
+        # Reading the ids from the records would parse every mapped record at startup.
+        if artifact['city_ids'] is not None:
+            self.city_ids = self._build_city_ids(artifact['city_ids'].tolist())
+        else:
+            self.city_ids = self._build_city_ids([record["id"] for record in self.city_records])
+        self.index = build_index(self.index_backend, artifact['training_matrix'], **self.index_options)
+        if artifact['filters'] is not None:
+            keys, bits = artifact['filters']
+            self.filter_index = InvertedIndex(len(self.train_cities), keys, bits)
+        else:
+            self.filter_index = self._build_filter_index(self.city_details)
+
+        print(f"Artifact loaded from {self.artifact_dir}: {len(self.index)} cities in "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def load_topk_table(self):
+        if not self.topk_table_path or not os.path.isfile(self.topk_table_path):
+            return
+
+        try:
+            table = TopKTable.load(self.topk_table_path)
+        except Exception as e:
+            print(f"Error loading top-k table from {self.topk_table_path}: {e}")
+            return
+
+        if table.model_fingerprint != fingerprint(self.index.vectors):
+            print(f"Top-k table {self.topk_table_path} was built for a different model or search version, ignoring it")
+            return
+
+        self.topk_table = table
+        print(f"Top-k table loaded: {len(table)} profiles x {table.k} neighbours "
+              f"({table.nbytes() / 2**20:.1f} MiB)")
+
+    def _build_city_details(self, dataset):
+        cleaned = dataset.astype(object).where(dataset.notna(), None)
+        return cleaned.to_dict('records')
+
+    def _build_city_records(self, city_details):
+        records = []
+        for index, details in enumerate(city_details):
+            city_full = details['city']
+            parts = city_full.split(',')
+            try:
+                city_id = int(details.get('id') or 0)
+            except (TypeError, ValueError):
+                city_id = 0
+
+            records.append({
+                "index": index,
+                "city": city_full,
+                "country": parts[-1].strip() if len(parts) > 1 else "",
+                "id": city_id,
+                "image": details.get('city_photo') or ""
+            })
+        return records
+
+    @staticmethod
+    def _build_city_ids(ids):
+        city_ids = {}
+        for index, city_id in enumerate(ids):
+            city_ids.setdefault(city_id, index)
+        return city_ids
+
+    def _build_filter_index(self, city_details):
+        rows = (
+            (index, {
+                'months': self.clean_and_parse_list(details.get('best_months')),
+                'durations': self.clean_and_parse_list(details.get('ideal_durations')),
+                'budget': self._budget_values(details.get('budget_levl'))
+            })
+            for index, details in enumerate(city_details)
+        )
+        return InvertedIndex.build(rows, len(city_details))
+
+    @staticmethod
+    def _budget_values(raw_budget):
+        try:
+            return {str(int(float(raw_budget)))}
+        except (TypeError, ValueError):
+            return set()
+
     def clean_and_parse_list(self, raw_string):
         if pd.isna(raw_string):
             return set()
@@ -44,10 +326,8 @@ class Recommender:
     def map_months(self, month_num_list):
         return [self.MONTH_MAP.get(month, month) for month in month_num_list]
 
-    def get_recommendations(self, preferences, n_recommendations=5):
-
-        raw_duration = preferences.get('ideal_durations', ['Shorttrip'])
-
+    @staticmethod
+    def _map_durations(raw_duration):
         if isinstance(raw_duration, str):
              raw_duration = [raw_duration]
         
@@ -63,6 +343,30 @@ class Recommender:
             elif d_str in ["2Weeks", "10Days", "Long"]:
                 mapped_duration.append("Longtrip")
 
+        return mapped_duration
+
+    @staticmethod
+    def preference_key(preferences):
+        # Two profiles with the same key encode to the same feature vector.
+        durations = Recommender._map_durations(preferences.get('ideal_durations', ['Shorttrip'])) or ["Shorttrip"]
+        months = preferences.get('best_months', [])
+        if isinstance(months, (list, tuple)):
+            months = tuple(sorted(str(month) for month in months))
+        else:
+            months = (None, str(months))
+
+        return (
+            tuple(sorted(durations)),
+            months,
+            int(preferences.get('budget_levl', 2)),
+            *(int(preferences.get(name, 0)) for name in INTERESTS)
+        )
+
+    @staticmethod
+    def _preference_row(preferences):
+
+        mapped_duration = Recommender._map_durations(preferences.get('ideal_durations', ['Shorttrip']))
+
         if not mapped_duration:
              mapped_duration = ["Shorttrip"]
 
@@ -70,72 +374,155 @@ class Recommender:
 
         months_str = str(preferences.get('best_months', [])).replace("'", '"')
 
-        pref_df_data = {
-            'ideal_durations': [duration_str],
-            'budget_levl': [int(preferences.get('budget_levl', 2))],
-            'culture': [int(preferences.get('culture', 0))],
-            'adventure': [int(preferences.get('adventure', 0))],
-            'nature': [int(preferences.get('nature', 0))],
-            'beaches': [int(preferences.get('beaches', 0))],
-            'nightlife': [int(preferences.get('nightlife', 0))],
-            'cuisine': [int(preferences.get('cuisine', 0))],
-            'wellness': [int(preferences.get('wellness', 0))],
-            'urban': [int(preferences.get('urban', 0))],
-            'seclusion': [int(preferences.get('seclusion', 0))],
-            'best_months': [months_str]
+        return {
+            'ideal_durations': duration_str,
+            'budget_levl': int(preferences.get('budget_levl', 2)),
+            'culture': int(preferences.get('culture', 0)),
+            'adventure': int(preferences.get('adventure', 0)),
+            'nature': int(preferences.get('nature', 0)),
+            'beaches': int(preferences.get('beaches', 0)),
+            'nightlife': int(preferences.get('nightlife', 0)),
+            'cuisine': int(preferences.get('cuisine', 0)),
+            'wellness': int(preferences.get('wellness', 0)),
+            'urban': int(preferences.get('urban', 0)),
+            'seclusion': int(preferences.get('seclusion', 0)),
+            'best_months': months_str
         }
 
-        new_preference = pd.DataFrame(pref_df_data)
+    def _build_recommendations(self, distances, indices, lean=False):
+        train_cities = self.train_cities
 
-        try:
-            transformed_preference = self.model.named_steps['preprocessor'].transform(new_preference)
-            distances, indices = self.model.named_steps['classifier'].kneighbors(
-                transformed_preference,
-                n_neighbors=n_recommendations
-            )
-
-            train_cities = self.model.named_steps['classifier'].train_cities
-            
-            recommendations = []
-            
-            for i in range(n_recommendations):
-                rec_index = indices[0][i]
-                rec_city_name = train_cities[rec_index]
-                rec_city_distance = distances[0][i]
-
-                city_data = self.dataset.iloc[rec_index]
-
-                details_dict = city_data.to_dict()
-                for k, v in details_dict.items():
-                    if pd.isna(v):
-                        details_dict[k] = None
+        recommendations = []
 
+        for rec_index, rec_city_distance in zip(indices, distances):
+            if lean:
+                # Only what the recommendations page renders; full details are at /api/city/<id>.
+                record = self.city_records[rec_index]
+                rec_obj = {
+                    "id": record["id"],
+                    "city": train_cities[rec_index],
+                    "distance": float(rec_city_distance),
+                    "image": record["image"]
+                }
+            else:
                 rec_obj = {
-                    "city": rec_city_name,
+                    "city": train_cities[rec_index],
                     "distance": float(rec_city_distance),
-                    "details": details_dict
+                    "details": self.city_details[rec_index]
                 }
-                recommendations.append(rec_obj)
-                
-            return recommendations
+            recommendations.append(rec_obj)
+
+        return recommendations
+
+    def _transform(self, rows):
+        if self.encoder is not None:
+            return self.encoder.encode_many(rows)
+        return self.model.named_steps['preprocessor'].transform(pd.DataFrame(rows))
+
+    def _filter_constraints(self, filters):
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        constraints = {}
+        for field in FILTER_FIELDS:
+            raw_values = filters.get(field)
+            if raw_values is None or raw_values == []:
+                continue
+            if not isinstance(raw_values, list):
+                raw_values = [raw_values]
+
+            values = set()
+            for raw in raw_values:
+                if field == 'months':
+                    month = str(raw).strip()
+                    month = self.MONTH_NUMBERS.get(month.lower(), month.zfill(2))
+                    if month not in self.MONTH_MAP:
+                        raise ValueError(f"Invalid month filter: {raw}")
+                    values.add(month)
+                elif field == 'durations':
+                    mapped = self._map_durations([raw])
+                    if not mapped:
+                        raise ValueError(f"Invalid duration filter: {raw}")
+                    values.update(mapped)
+                else:
+                    budget = self._budget_values(raw)
+                    if not budget:
+                        raise ValueError(f"Invalid budget filter: {raw}")
+                    values.update(budget)
+            constraints[field] = values
+
+        return constraints
+
+    def filter_candidates(self, filters):
+        if not filters:
+            return None
+        if not isinstance(filters, dict):
+            raise ValueError("filters must be an object")
+
+        constraints = self._filter_constraints(filters)
+        if not constraints:
+            return None
+        return self.filter_index.match(constraints)
+
+    def get_recommendations(self, preferences, n_recommendations=5, filters=None, lean=False):
+        return self.get_recommendations_batch([preferences], n_recommendations, filters, lean)[0]
+
+    def get_recommendations_batch(self, preferences_list, n_recommendations=5, filters=None, lean=False):
+        if not preferences_list:
+            return []
+
+        candidates = self.filter_candidates(filters)
+
+        try:
+            results = [None] * len(preferences_list)
+            if self.topk_table is not None and candidates is None:
+                with span("recommender.topk_lookup"):
+                    for row, preferences in enumerate(preferences_list):
+                        results[row] = self.topk_table.lookup(self.preference_key(preferences), n_recommendations)
+
+            misses = [row for row, result in enumerate(results) if result is None]
+            if misses:
+                with span("recommender.preprocess"):
+                    rows = [self._preference_row(preferences_list[row]) for row in misses]
+                    transformed_preferences = self._transform(rows)
+
+                with span("recommender.search"):
+                    distances, indices = self.index.search(transformed_preferences, n_recommendations, candidates)
+
+                for position, row in enumerate(misses):
+                    results[row] = (distances[position], indices[position])
+
+            with span("recommender.details"):
+                return [self._build_recommendations(distances, indices, lean) for distances, indices in results]
 
         except Exception as e:
             print(f"Error generating recommendations: {e}")
             raise
 
+    def get_city(self, city_id):
+        index = self.city_ids.get(city_id)
+        if index is None:
+            return None
+        return self.city_details[index]
+
+    def get_city_payload(self, city_id):
+        # The serialized /api/city body and its hash, built once per city for this model.
+        payload = self._city_payloads.get(city_id)
+        if payload is None:
+            details = self.get_city(city_id)
+            if details is None:
+                return None
+            body = json.dumps(details, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+            payload = self._city_payloads[city_id] = (body, hashlib.sha1(body).hexdigest())
+        return payload
+
+    def get_city_names(self):
+        return [details['city'] for details in self.city_details]
+
     def get_random_city(self):
 
-        if self.dataset is None or self.dataset.empty:
+        if not self.city_records:
             return None
 
-        random_row = self.dataset.sample(n=1).iloc[0]
-        city_full = random_row['city']
-
-        parts = city_full.split(',')
-        country = parts[-1].strip() if len(parts) > 1 else ""
-        
-        return {
-            "city": city_full,
-            "country": country,
-            "details": random_row.to_dict()
-        }
+        return dict(self.city_records[self._rng.randrange(len(self.city_records))])
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+
+
+class ReloadableRecommender:
+    # Read-copy-update around an immutable Recommender: every call grabs the
+    # current instance once and runs entirely on it, while reloads build a new
+    # instance off to the side and publish it with a single reference swap.
+    def __init__(self, factory, watch_paths=(), warmup=None):
+        self.factory = factory
+        self.watch_paths = [path for path in watch_paths if path]
+        self.warmup = warmup
+        self._reload_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+        signature = self._signature()
+        self.current = factory()
+        # The watcher reloads when the files differ from what was last tried, so a broken file is not retried in a loop.
+        self._tried_signature = signature
+        self.generation = 1
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.failures = 0
+        self.reloading = False
+        self.last_error = None
+        self.last_duration = None
+
+    def _signature(self):
+        signature = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def reload(self, blocking=True):
+        if not self._reload_lock.acquire(blocking=blocking):
+            return False
+
+        try:
+            with self._status_lock:
+                self.reloading = True
+            signature = self._signature()
+            started = time.perf_counter()
+
+            try:
+                recommender = self.factory()
+                if self.warmup is not None:
+                    self.warmup(recommender)
+            except Exception as e:
+                self._tried_signature = signature
+                print(f"Recommender reload failed, keeping generation {self.generation}: {e}")
+                with self._status_lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                return False
+
+            # Requests already running keep the instance they started with; new ones see this one.
+            self.current = recommender
+            self._tried_signature = signature
+
+            with self._status_lock:
+                self.generation += 1
+                self.reloads += 1
+                self.loaded_at = time.time()
+                self.last_error = None
+                self.last_duration = time.perf_counter() - started
+            print(f"Recommender generation {self.generation} loaded in {self.last_duration:.2f}s: "
+                  f"{len(recommender.index)} cities")
+            return True
+        finally:
+            with self._status_lock:
+                self.reloading = False
+            self._reload_lock.release()
+
+    def reload_in_background(self):
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, args=(False,), name="recommender-reload", daemon=True).start()
+        return True
+
+    def start_watcher(self, interval):
+        if self._watcher is not None or interval <= 0 or not self.watch_paths:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="recommender-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch_loop(self, interval):
+        pending = None
+        while not self._stop.wait(interval):
+            signature = self._signature()
+            if signature == self._tried_signature:
+                pending = None
+                continue
+            # Wait for one quiet interval so a file that is still being written is not loaded.
+            if signature != pending:
+                pending = signature
+                continue
+            pending = None
+            print("Recommender files changed, reloading")
+            self.reload()
+
+    def status(self):
+        with self._status_lock:
+            return {
+                "generation": self.generation,
+                "loaded_at": self.loaded_at,
+                "reloading": self.reloading,
+                "reloads": self.reloads,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_duration": self.last_duration
+            }
+
+    @property
+    def topk_table(self):
+        return self.current.topk_table
+
+    def get_recommendations(self, preferences, n_recommendations=5, filters=None, lean=False):
+        return self.current.get_recommendations(preferences, n_recommendations, filters, lean)
+
+    def get_recommendations_batch(self, preferences_list, n_recommendations=5, filters=None, lean=False):
+        return self.current.get_recommendations_batch(preferences_list, n_recommendations, filters, lean)
+
+    def get_city(self, city_id):
+        return self.current.get_city(city_id)
+
+    def get_city_payload(self, city_id):
+        return self.current.get_city_payload(city_id)
+
+    def get_city_names(self):
+        return self.current.get_city_names()
+
+    def get_random_city(self):
+        return self.current.get_random_city()
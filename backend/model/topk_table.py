@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+DURATION_CHOICES = [["Shorttrip"], ["Longtrip"], ["Shorttrip", "Longtrip"]]
+MONTH_CHOICES = [[]] + [['%02d' % month] for month in range(1, 13)]
+BUILD_BATCH = 4096
+# Bumped when the neighbour order changes, so tables built by an older search are rejected like a stale model.
+SEARCH_VERSION = b"ties-by-id-2"
+
+
+def fingerprint(vectors):
+    return hashlib.sha1(SEARCH_VERSION + np.ascontiguousarray(vectors, dtype=np.float64).tobytes()).hexdigest()
+
+
+def key_hash(key):
+    # Keys are tuples of strings, ints and None, whose repr is stable across processes.
+    return int.from_bytes(hashlib.blake2b(repr(key).encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class TopKTable:
+    def __init__(self, hashes, distances, indices, model_fingerprint):
+        # Rows are sorted by the 64-bit hash of their preference key, so the
+        # whole table is three flat arrays searched with searchsorted.
+        self.hashes = hashes
+        self.distances = distances
+        self.indices = indices
+        self.k = indices.shape[1]
+        self.model_fingerprint = model_fingerprint
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _row(self, key):
+        h = key_hash(key)
+        row = int(np.searchsorted(self.hashes, h))
+        if row < len(self.hashes) and self.hashes[row] == h:
+            return row
+        return None
+
+    def lookup(self, key, k):
+        row = self._row(key) if k <= self.k else None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        return self.distances[row, :k], self.indices[row, :k]
+
+    def nbytes(self):
+        return int(self.hashes.nbytes + self.distances.nbytes + self.indices.nbytes)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": len(self),
+            "k": self.k,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "bytes": self.nbytes()
+        }
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            hashes=self.hashes,
+            distances=self.distances,
+            indices=self.indices,
+            fingerprint=np.array(self.model_fingerprint)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['hashes'],
+                data['distances'],
+                data['indices'],
+                str(data['fingerprint'])
+            )
+
+
+def build_table(recommender, profiles, k):
+    # profiles may repeat; the first profile seen for each normalized key is the one encoded.
+    representatives = {}
+    for preferences in profiles:
+        key = recommender.preference_key(preferences)
+        if key not in representatives:
+            representatives[key] = preferences
+
+    keys = list(representatives)
+    hashes = np.array([key_hash(key) for key in keys], dtype=np.int64)
+    order = np.argsort(hashes, kind='stable')
+    keys = [keys[i] for i in order]
+    hashes = hashes[order]
+    if len(hashes) > 1 and (hashes[1:] == hashes[:-1]).any():
+        raise ValueError("Preference key hash collision, cannot build the table")
+
+    k = min(k, len(recommender.index))
+    distances = np.empty((len(keys), k), dtype=np.float64)
+    indices = np.empty((len(keys), k), dtype=np.int32)
+
+    for start in range(0, len(keys), BUILD_BATCH):
+        chunk = keys[start:start + BUILD_BATCH]
+        rows = [recommender._preference_row(representatives[key]) for key in chunk]
+        chunk_distances, chunk_indices = recommender.index.search(recommender._transform(rows), k)
+        distances[start:start + len(chunk)] = chunk_distances
+        indices[start:start + len(chunk)] = chunk_indices
+
+    return TopKTable(hashes, distances, indices, fingerprint(recommender.index.vectors))
+
+
+def enumerate_profiles(interests):
+    # Every duration, budget and interest combination with no month or a single month.
+    for durations, months, budget in itertools.product(DURATION_CHOICES, MONTH_CHOICES, (1, 2, 3)):
+        for scores in itertools.product((0, 1), repeat=len(interests)):
+            yield {
+                'ideal_durations': durations,
+                'best_months': months,
+                'budget_levl': budget,
+                **dict(zip(interests, scores))
+            }
+
+
+def read_preference_log(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict):
+                yield entry.get('preferences', entry)
+
+
+def frequent_profiles(recommender, preferences, top):
+    counts = Counter()
+    representatives = {}
+    for entry in preferences:
+        try:
+            key = recommender.preference_key(entry)
+        except (TypeError, ValueError):
+            continue
+        counts[key] += 1
+        representatives.setdefault(key, entry)
+
+    covered = sum(count for _, count in counts.most_common(top))
+    total = sum(counts.values())
+    return [representatives[key] for key, _ in counts.most_common(top)], covered, total
+
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, base_dir)
+    from model.recommender import INTERESTS, Recommender
+
+    parser = argparse.ArgumentParser(description="Precompute top-k recommendations for frequent preference profiles")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build')
+    build.add_argument('--model', default=os.path.join(base_dir, 'model/destinai_model.pkl'))
+    build.add_argument('--dataset', default=os.path.join(base_dir, 'model/destinai_final_dataset.csv'))
+    build.add_argument('--artifact', default=os.path.join(base_dir, 'model/artifact'))
+    build.add_argument('--index', default=os.getenv('RECOMMENDER_INDEX', 'exact'))
+    build.add_argument('--log', help="JSON-lines preference log to learn the most frequent profiles from")
+    build.add_argument('--top', type=int, default=5000, help="profiles to keep from the log")
+    build.add_argument('--enumerate', action='store_true', help="also add every single-month profile")
+    build.add_argument('--k', type=int, default=10)
+    build.add_argument('--out', default=os.path.join(base_dir, 'model/topk_table.npz'))
+
+    args = parser.parse_args()
+    if not args.log and not args.enumerate:
+        parser.error("pass --log, --enumerate or both")
+
+    recommender = Recommender(args.model, args.dataset, index_backend=args.index, artifact_dir=args.artifact)
+    started = time.perf_counter()
+
+    profiles = []
+    if args.log:
+        logged, covered, total = frequent_profiles(recommender, read_preference_log(args.log), args.top)
+        profiles.extend(logged)
+        print(f"{len(logged)} most frequent profiles cover {covered}/{total} logged requests "
+              f"({covered / total if total else 0:.1%})")
+    if args.enumerate:
+        profiles.extend(enumerate_profiles(INTERESTS))
+
+    table = build_table(recommender, profiles, args.k)
+    table.save(args.out)
+    print(f"Wrote {len(table)} profiles x {table.k} neighbours ({table.nbytes() / 2**20:.1f} MiB) to {args.out} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
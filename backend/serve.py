@@ -0,0 +1,79 @@
+import argparse
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+class DestinAIServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+
+def post_fork(server, worker):
+    import app as app_module
+    app_module.start_background_work()
+    server.log.info(f"Worker {worker.pid} started background work")
+
+
+def worker_exit(server, worker):
+    import app as app_module
+    app_module.brief_pool.stop()
+    app_module.review_store.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the DestinAI backend with a pre-fork gunicorn server")
+    # HOST is the RapidAPI host in .env, so the bind address has its own variable.
+    parser.add_argument('--host', default=os.getenv('SERVER_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVER_WORKERS', multiprocessing.cpu_count())))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVER_THREADS', 16)))
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVER_TIMEOUT', 180)))
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 120)))
+    parser.add_argument('--max-requests', type=int, default=int(os.getenv('SERVER_MAX_REQUESTS', 0)))
+    parser.add_argument('--pidfile', default=os.getenv('SERVER_PIDFILE', os.path.join(os.path.dirname(__file__), 'destinai.pid')))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Stop app.py from starting threads and SQLite connections in the master; post_fork starts them per worker.
+    os.environ['DEFER_BACKGROUND_WORK'] = '1'
+    # Workers share these stores, so briefs and geo IDs warmed by the leader worker serve every worker.
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    os.environ.setdefault('CITY_BRIEF_STORE_PATH', os.path.join(backend_dir, 'city_briefs.db'))
+    os.environ.setdefault('GEO_CACHE_PATH', os.path.join(backend_dir, 'geo_ids.db'))
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'preload_app': True,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'pidfile': args.pidfile,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+        'accesslog': '-',
+    }
+    print(f"Serving on {options['bind']} with {args.workers} workers x {args.threads} threads "
+          f"(kill -HUP $(cat {args.pidfile}) for a graceful worker restart)")
+    DestinAIServer(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import atexit
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CityBriefPool:
+    def __init__(self, generate, refresh_interval=24 * 3600, briefs_per_city=1, workers=2, store=None, enabled=True):
+        self.generate = generate
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.briefs_per_city = briefs_per_city
+        self.store = store
+        self._briefs = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="city-brief")
+        # Warm-up keeps only a few cities queued, so shutdown never waits on a backlog of generations.
+        self.max_warm_pending = workers * 2
+        self._stopped = threading.Event()
+        self._refresher = None
+        self.hits = 0
+        self.misses = 0
+
+    def _is_stale(self, entry):
+        return time.time() - entry["generated_at"] > self.refresh_interval
+
+    def get(self, city):
+        entry = self._briefs.get(city)
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            self.request(city)
+            return None
+
+        with self._lock:
+            self.hits += 1
+        if self._is_stale(entry):
+            self.request(city)
+        return self._rng.choice(entry["briefs"])
+
+    def request(self, city):
+        # Without an API key every generation would fail, so misses just use the fallback.
+        if not self.enabled or self._stopped.is_set():
+            return
+        with self._lock:
+            if city in self._pending:
+                return
+            self._pending.add(city)
+        try:
+            self._executor.submit(self._refresh, city)
+        except RuntimeError:
+            # stop() shut the executor down between the check above and the submit.
+            with self._lock:
+                self._pending.discard(city)
+
+    def _refresh(self, city):
+        try:
+            # Another worker may already have generated it into the shared store.
+            stored = self._read_stored(city)
+            if stored is not None and not self._is_stale(stored):
+                self._briefs[city] = stored
+                return
+
+            briefs = [self.generate(city) for _ in range(self.briefs_per_city)]
+            entry = {"briefs": briefs, "generated_at": time.time()}
+            self._briefs[city] = entry
+            if self.store is not None:
+                self.store.set(city, entry, None)
+        except Exception as e:
+            print(f"Error generating brief for {city}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(city)
+
+    def _read_stored(self, city):
+        if self.store is None:
+            return None
+        try:
+            stored = self.store.get(city)
+        except Exception as e:
+            print(f"Error reading stored brief for {city}: {e}")
+            return None
+        return stored[1] if stored is not None else None
+
+    def _load_stored(self, city):
+        if city in self._briefs:
+            return
+        stored = self._read_stored(city)
+        if stored is not None:
+            self._briefs[city] = stored
+
+    def warm(self, cities):
+        for city in cities:
+            if self._stopped.is_set():
+                return
+            self._load_stored(city)
+            entry = self._briefs.get(city)
+            if entry is None or self._is_stale(entry):
+                while len(self._pending) >= self.max_warm_pending:
+                    if self._stopped.wait(0.1):
+                        return
+                self.request(city)
+
+    def start(self, cities, check_interval=600, should_warm=None):
+        if self._refresher is not None:
+            return
+
+        def refresh_loop():
+            while not self._stopped.is_set():
+                if should_warm is None or should_warm():
+                    self.warm(cities)
+                    self._stopped.wait(check_interval)
+                else:
+                    self._stopped.wait(min(check_interval, 60))
+
+        self._refresher = threading.Thread(target=refresh_loop, name="city-brief-refresher", daemon=True)
+        self._refresher.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        # Drops queued generations; the ones already calling the API finish on their own.
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cities": len(self._briefs),
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metrics import UPSTREAM_REQUESTS
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+ASYNC_RETRY_EXCEPTIONS = (httpx.TransportError,)
+# A read timeout on a POST may mean the upstream is still running (and billing) the request,
+# so non-idempotent requests are only retried when they never reached it.
+CONNECT_RETRY_EXCEPTIONS = (requests.ConnectionError,)
+ASYNC_CONNECT_RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class UpstreamStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.status_counts = {}
+
+    def record(self, seconds, status=None, error=False):
+        with self._lock:
+            self.requests += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if error:
+                self.errors += 1
+            key = str(status) if status is not None else "exception"
+            self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "mean_seconds": self.total_seconds / self.requests if self.requests else 0.0,
+                "max_seconds": self.max_seconds,
+                "status_counts": dict(self.status_counts)
+            }
+
+
+class BaseHTTPClient:
+    def __init__(self, name, connect_timeout=5.0, read_timeout=30.0, max_retries=2,
+                 backoff=0.5, max_backoff=8.0):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = UpstreamStats()
+
+    def _record(self, method, seconds, status=None):
+        error = status is None or status >= 400
+        self.stats.record(seconds, status, error=error)
+        UPSTREAM_REQUESTS.observe(seconds, self.name, method, str(status) if status is not None else "exception")
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        # Full jitter keeps a burst of failed callers from retrying in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+class HTTPClient(BaseHTTPClient):
+    def __init__(self, name, connect_timeout=5.0, read_timeout=30.0, max_retries=2,
+                 backoff=0.5, max_backoff=8.0, pool_size=20):
+        super().__init__(name, connect_timeout, read_timeout, max_retries, backoff, max_backoff)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        retry_exceptions = RETRY_EXCEPTIONS if method.upper() in IDEMPOTENT_METHODS else CONNECT_RETRY_EXCEPTIONS
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            started = time.perf_counter()
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except retry_exceptions:
+                self._record(method, time.perf_counter() - started)
+                if last_attempt:
+                    raise
+                self.stats.record_retry()
+                time.sleep(self._retry_delay(attempt))
+                continue
+            except Exception:
+                self._record(method, time.perf_counter() - started)
+                raise
+
+            elapsed = time.perf_counter() - started
+            self._record(method, elapsed, response.status_code)
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                self.stats.record_retry()
+                delay = self._retry_delay(attempt, response)
+                response.close()
+                time.sleep(delay)
+                continue
+
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+
+class AsyncHTTPClient(BaseHTTPClient):
+    def __init__(self, name, connect_timeout=5.0, read_timeout=30.0, max_retries=2,
+                 backoff=0.5, max_backoff=8.0, pool_size=200, transport=None):
+        super().__init__(name, connect_timeout, read_timeout, max_retries, backoff, max_backoff)
+
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport
+        )
+
+    async def request(self, method, url, stream=False, **kwargs):
+        if kwargs.get("headers"):
+            # requests drops None-valued headers, httpx rejects them.
+            kwargs["headers"] = {k: v for k, v in kwargs["headers"].items() if v is not None}
+        if method.upper() in IDEMPOTENT_METHODS:
+            retry_exceptions = ASYNC_RETRY_EXCEPTIONS
+        else:
+            retry_exceptions = ASYNC_CONNECT_RETRY_EXCEPTIONS
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            started = time.perf_counter()
+
+            try:
+                response = await self.client.send(self.client.build_request(method, url, **kwargs), stream=stream)
+            except retry_exceptions:
+                self._record(method, time.perf_counter() - started)
+                if last_attempt:
+                    raise
+                self.stats.record_retry()
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            except Exception:
+                self._record(method, time.perf_counter() - started)
+                raise
+
+            elapsed = time.perf_counter() - started
+            self._record(method, elapsed, response.status_code)
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                self.stats.record_retry()
+                delay = self._retry_delay(attempt, response)
+                await response.aclose()
+                await asyncio.sleep(delay)
+                continue
+
+            return response
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client_options(name, defaults):
+    prefix = name.upper()
+    options = dict(defaults)
+    for option, cast in (("connect_timeout", float), ("read_timeout", float), ("max_retries", int)):
+        value = os.getenv(f"{prefix}_{option.upper()}")
+        if value is not None:
+            options[option] = cast(value)
+    return options
+
+
+def get_client(name, **defaults):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = HTTPClient(name, **_client_options(name, defaults))
+        return _clients[name]
+
+
+def get_async_client(name, **defaults):
+    with _clients_lock:
+        if name not in _async_clients:
+            _async_clients[name] = AsyncHTTPClient(name, **_client_options(name, defaults))
+        return _async_clients[name]
+
+
+def upstream_stats():
+    with _clients_lock:
+        clients = dict(_clients)
+        clients.update({f"{name}_async": client for name, client in _async_clients.items()})
+    return {name: client.stats.snapshot() for name, client in clients.items()}
@@ -0,0 +1,37 @@
+import os
+import threading
+
+# fcntl is POSIX-only; the Windows development server is a single process and always leads.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class LeaderLock:
+    # One worker per machine holds an exclusive lock on the file for as long as it lives,
+    # so work like cache warm-up runs once rather than once per gunicorn worker. The lock
+    # is released by the kernel when the holder exits, and the next caller takes over.
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._file is not None:
+                return True
+            if not self.path or fcntl is None:
+                self._file = True
+                return True
+
+            f = open(self.path, 'a')
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+
+            self._file = f
+            print(f"Process {os.getpid()} is the background work leader")
+            return True
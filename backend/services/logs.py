@@ -0,0 +1,9 @@
+import os
+
+# Full upstream payloads and per-request debug lines are expensive to format and print, so they are opt-in.
+VERBOSE = os.getenv("VERBOSE_LOGGING", "").lower() in ("1", "true", "yes")
+
+
+def debug(message):
+    if VERBOSE:
+        print(message)
@@ -0,0 +1,158 @@
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            series = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labelvalues, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._collectors = []
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, labelnames, buckets)
+            return self._histograms[name]
+
+    def register_collector(self, collector):
+        # A collector returns (name, type, help, [(labels dict, value), ...]) tuples at scrape time.
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, metric_type, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPANS = REGISTRY.histogram(
+    "destinai_span_seconds", "Time spent in instrumented code paths.", ("span",)
+)
+UPSTREAM_REQUESTS = REGISTRY.histogram(
+    "destinai_upstream_request_seconds", "Latency of each upstream HTTP attempt.", ("upstream", "method", "status")
+)
+HTTP_REQUESTS = REGISTRY.histogram(
+    "destinai_http_request_seconds", "Latency of requests served by the backend.", ("endpoint", "method", "status")
+)
+# HTTP_REQUESTS stops at the response headers, so streamed bodies are timed to their last chunk here.
+HTTP_STREAMS = REGISTRY.histogram(
+    "destinai_http_stream_seconds", "Time until a streamed response body finished.", ("endpoint", "outcome")
+)
+
+
+@contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SPANS.observe(time.perf_counter() - started, name)
+
+
+def timed_stream(chunks, endpoint, started):
+    outcome = "error"
+    try:
+        for chunk in chunks:
+            yield chunk
+        outcome = "complete"
+    except GeneratorExit:
+        outcome = "disconnected"
+        raise
+    finally:
+        chunks.close()
+        HTTP_STREAMS.observe(time.perf_counter() - started, endpoint, outcome)
+
+
+async def async_timed_stream(chunks, endpoint, started):
+    outcome = "error"
+    try:
+        async for chunk in chunks:
+            yield chunk
+        outcome = "complete"
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "disconnected"
+        raise
+    finally:
+        await chunks.aclose()
+        HTTP_STREAMS.observe(time.perf_counter() - started, endpoint, outcome)
+
+
+def render():
+    return REGISTRY.render()
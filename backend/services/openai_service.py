@@ -1,151 +1,531 @@
-import requests
+import asyncio
+import json
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from services.cache import cache_from_env, make_key, text_hash
+from services.http_client import get_async_client, get_client
+from services.logs import debug
+from services.metrics import span
+from services.singleflight import AsyncSingleFlight, SingleFlight
+
+PROMPT_PREFERENCES = ('adventure', 'culture', 'nature', 'nightlife', 'budget')
+
+# Three one-line activities and a title come to roughly 150 output tokens per day.
+ITINERARY_BASE_TOKENS = int(os.getenv('ITINERARY_BASE_TOKENS', 200))
+ITINERARY_TOKENS_PER_DAY = int(os.getenv('ITINERARY_TOKENS_PER_DAY', 220))
+ITINERARY_MAX_TOKENS = int(os.getenv('ITINERARY_MAX_TOKENS', 16000))
+# Trips of at least ITINERARY_CHUNK_MIN_DAYS are generated as parallel requests of about ITINERARY_CHUNK_DAYS days each.
+ITINERARY_CHUNK_DAYS = int(os.getenv('ITINERARY_CHUNK_DAYS', 4))
+ITINERARY_CHUNK_MIN_DAYS = int(os.getenv('ITINERARY_CHUNK_MIN_DAYS', 8))
+
+class ItineraryParser:
+    day_pattern = re.compile(r"Day\s+(\d+)\s*[:|-]\s*(.*)", re.IGNORECASE)
+    bullet_chars = "-*0123456789."
 
-class OpenAIService:
     def __init__(self):
+        self.current_day = None
+
+    @classmethod
+    def match_day(cls, line):
+        # "day" has no non-ASCII case variants, so lines without some casing of "ay" can skip the regex.
+        if "ay" in line or "AY" in line or "Ay" in line or "aY" in line:
+            return cls.day_pattern.search(line)
+        return None
+
+    @staticmethod
+    def new_day(day_match):
+        day_title = day_match.group(2).strip().replace("**", "").replace('": [', '').replace('"', '').replace(":", "")
+        return {
+            "day": day_match.group(1),
+            "title": day_title,
+            "activities": []
+        }
+
+    @classmethod
+    def parse_activity(cls, line):
+        first = line[0]
+        if not (first == "-" or first == "*" or (first.isdigit() and len(line) > 1 and line[1] == ".")):
+            return None
+
+        clean_line = line.lstrip(cls.bullet_chars).lstrip()
+
+        time_val = "Anytime"
+        remainder = clean_line
+
+        potential_time, colon, after_time = clean_line.partition(":")
+        if colon:
+            potential_time = potential_time.strip().replace("*", "")
+            if len(potential_time) < 20:
+                time_val = potential_time
+                remainder = after_time.strip()
+
+        title, separator, desc = remainder.partition(" - ")
+        if not separator:
+            title, separator, desc = remainder.partition(": ")
+
+        if separator:
+            title = title.strip().replace("**", "")
+            desc = desc.strip()
+        else:
+            title = remainder.strip().replace("**", "")
+            desc = ""
+
+        if not title:
+            return None
+
+        return {
+            "time": time_val,
+            "title": title,
+            "desc": desc
+        }
+
+    def feed_line(self, line):
+        line = line.strip()
+        if not line:
+            return None
+
+        day_match = self.match_day(line)
+        if day_match:
+            completed = self.current_day
+            self.current_day = self.new_day(day_match)
+            return completed
+
+        if self.current_day:
+            activity = self.parse_activity(line)
+            if activity:
+                self.current_day["activities"].append(activity)
+
+        return None
+
+    def close(self):
+        completed = self.current_day
+        self.current_day = None
+        return completed
+
+    @classmethod
+    def parse(cls, text):
+        itinerary = []
+        activities = None
+        match_day = cls.match_day
+        parse_activity = cls.parse_activity
+
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+
+            day_match = match_day(line)
+            if day_match:
+                day = cls.new_day(day_match)
+                itinerary.append(day)
+                activities = day["activities"]
+            elif activities is not None:
+                activity = parse_activity(line)
+                if activity:
+                    activities.append(activity)
+
+        return itinerary
+
+class OpenAIService:
+    def __init__(self, itinerary_cache=None, http_client=None):
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.url = "https://api.openai.com/v1/chat/completions"
+        self.url = f"{os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/')}/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        if itinerary_cache is None:
+            itinerary_cache = cache_from_env(
+                "ITINERARY_CACHE", max_entries=512, ttl=24 * 3600, table='itineraries'
+            )
+        self.itinerary_cache = itinerary_cache
+        self.http = http_client or get_client("openai", connect_timeout=5, read_timeout=120)
+        self.flights = SingleFlight()
+        self.chunk_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('ITINERARY_CHUNK_WORKERS', 16)), thread_name_prefix="itinerary-chunk"
+        )
 
-    def get_itinerary(self, city, preferences, duration, start_date, end_date, user_input=""):
-        print(f"DEBUG: Requesting itinerary for {city}, Duration: {duration} days")
+    def itinerary_cache_key(self, city, preferences, duration, user_input=""):
+        try:
+            duration = int(duration)
+        except (TypeError, ValueError):
+            duration = str(duration)
+
+        normalized_preferences = tuple(
+            (name, str(preferences.get(name)).strip().lower())
+            for name in PROMPT_PREFERENCES if name in preferences
+        )
+
+        return make_key(
+            " ".join(str(city).lower().split()),
+            duration,
+            normalized_preferences,
+            text_hash(user_input)
+        )
+
+    @staticmethod
+    def itinerary_max_tokens(n_days):
+        return min(ITINERARY_MAX_TOKENS, ITINERARY_BASE_TOKENS + ITINERARY_TOKENS_PER_DAY * max(1, n_days))
+
+    @staticmethod
+    def itinerary_chunks(duration):
+        try:
+            duration = int(duration)
+        except (TypeError, ValueError):
+            return None
+
+        # None means the whole trip is generated by one request.
+        if duration < max(2, ITINERARY_CHUNK_MIN_DAYS) or ITINERARY_CHUNK_DAYS < 1:
+            return None
+
+        # Even split, e.g. 10 days in chunks of 4 becomes 4 + 3 + 3.
+        n_chunks = -(-duration // ITINERARY_CHUNK_DAYS)
+        size, extra = divmod(duration, n_chunks)
+        chunks = []
+        first = 1
+        for i in range(n_chunks):
+            last = first + size + (1 if i < extra else 0) - 1
+            chunks.append((first, last))
+            first = last + 1
+        return chunks
+
+    @staticmethod
+    def _chunk_dates(start_date, end_date, days):
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return start_date, end_date
+        first, last = days
+        return (start + timedelta(days=first - 1)).strftime('%Y-%m-%d'), (start + timedelta(days=last)).strftime('%Y-%m-%d')
+
+    def _itinerary_payload(self, city, preferences, duration, start_date, end_date, user_input="", days=None):
+        if days is None:
+            try:
+                n_days = int(duration)
+            except (TypeError, ValueError):
+                n_days = 5
+            scope = f"Create a day-by-day itinerary for a {duration}-day trip to **{city}**. Write ALL {duration} days."
+        else:
+            first, last = days
+            n_days = last - first + 1
+            start_date, end_date = self._chunk_dates(start_date, end_date, days)
+            scope = (f"Create days {first} to {last} of a {duration}-day trip to **{city}**. "
+                     f"Write ONLY these {n_days} days, numbered Day {first} to Day {last}.")
+            if first > 1:
+                scope += (" Earlier days are planned separately and cover the best-known sights, "
+                          "so focus on other neighbourhoods, day trips and local experiences.")
 
         prompt = f"""
-You are an expert travel planner. Create a detailed day-by-day itinerary for a trip to **{city}** for exactly **{duration} days**.
-
-STRICT RULES:
-1. You MUST generate an itinerary for ALL {duration} days.
-2. Format each day strictly as: "Day X: Title of the day".
-3. Under each day, provide exactly 3 bullet points for activities.
-4. STRICT ACTIVITY FORMAT: "- [Time]: [Activity Name] - [Brief Description]"
-   Example: "- Morning: Visit the Louvre - Explore the world's largest art museum."
-5. Do not put the "Time" on its own line. It must be on the same line as the activity.
-6. Do NOT output JSON, Python lists, or Markdown code blocks. Just plain text.
-
-User Preferences:
-- Adventures: {preferences.get('adventure', False)}
-- Culture: {preferences.get('culture', False)}
-- Relaxation: {preferences.get('nature', False)}
-- Nightlife: {preferences.get('nightlife', False)}
-- Budget: {preferences.get('budget', 'medium')}
-- Date Range: {start_date} -> {end_date}
-
-User's Dream Holiday Description: "{user_input}"
+{scope}
+
+Format each day as "Day X: Title", followed by exactly 3 activity lines:
+"- [Time]: [Activity Name] - [Brief Description]"
+e.g. "- Morning: Visit the Louvre - Explore the world's largest art museum."
+Keep the time on the activity line and each description to one sentence. Plain text only: no JSON, lists or code blocks.
+
+Preferences: adventure={preferences.get('adventure', False)}, culture={preferences.get('culture', False)}, relaxation={preferences.get('nature', False)}, nightlife={preferences.get('nightlife', False)}, budget={preferences.get('budget', 'medium')}
+Dates: {start_date} -> {end_date}
+Dream holiday: "{user_input}"
         """.strip()
 
-        payload = {
+        return {
             "model": "gpt-4o",
             "messages": [
-                {"role": "system", "content": "You are an expert travel adviser. Output strictly formatted plain text."},
+                {"role": "system", "content": "You are an expert travel planner. Output strictly formatted plain text."},
                 {"role": "user", "content": prompt}
             ],
-            "max_tokens": 4000
+            "max_tokens": self.itinerary_max_tokens(n_days)
         }
 
+    @staticmethod
+    def _number_day(day, days, position):
+        # Chunks are numbered by their position in the trip, whatever numbers the model used.
+        day["day"] = str(days[0] + position)
+        return day
+
+    def _chunk_days(self, content, days):
+        parsed = ItineraryParser.parse(content) if content else []
+        first, last = days
+        return [self._number_day(day, days, position) for position, day in enumerate(parsed[:last - first + 1])]
+
+    def _merge_chunks(self, cache_key, chunks, contents):
+        itinerary = []
+        complete = True
+        with span("itinerary.parse"):
+            for days, content in zip(chunks, contents):
+                parsed = self._chunk_days(content, days)
+                complete = complete and len(parsed) == days[1] - days[0] + 1
+                itinerary.extend(parsed)
+
+        debug(f"DEBUG: Merged {len(itinerary)} days from {len(chunks)} chunks.")
+        if not itinerary:
+            texts = [content for content in contents if content]
+            return {"raw_text": "\n\n".join(texts)} if texts else None
+        # A trip with a missing chunk is still returned but not cached, so the next request retries it.
+        if complete:
+            self.itinerary_cache.set(cache_key, itinerary)
+        return itinerary
+
+    @staticmethod
+    def _itinerary_complete(itinerary, duration, finish_reason):
         try:
-            response = requests.post(
-                self.url,
-                headers=self.headers,
-                json=payload
-            )
-            response.raise_for_status()
-            content = response.json()['choices'][0]['message']['content']
-            print("DEBUG: Received response from OpenAI. Parsing...")
-            parsed = self._parse_itinerary(content)
-            print(f"DEBUG: Parsed {len(parsed) if parsed else 0} days.")
-            return parsed
-            
+            n_days = int(duration)
+        except (TypeError, ValueError):
+            n_days = 1
+        if finish_reason != "length" and len(itinerary) >= n_days:
+            return True
+        print(f"Itinerary stopped after {len(itinerary)} of {n_days} days (finish_reason {finish_reason}), not caching it")
+        return False
+
+    @staticmethod
+    def _retry_payload(payload):
+        return dict(payload, max_tokens=min(ITINERARY_MAX_TOKENS, payload["max_tokens"] * 2))
+
+    def get_itinerary(self, city, preferences, duration, start_date, end_date, user_input=""):
+        cache_key = self.itinerary_cache_key(city, preferences, duration, user_input)
+        cached = self.itinerary_cache.get(cache_key)
+        if cached is not None:
+            debug(f"DEBUG: Itinerary cache hit for {city}, Duration: {duration} days")
+            return cached
+
+        return self.flights.do(
+            cache_key, self._request_itinerary,
+            cache_key, city, preferences, duration, start_date, end_date, user_input
+        )
+
+    def _request_itinerary(self, cache_key, city, preferences, duration, start_date, end_date, user_input):
+        debug(f"DEBUG: Requesting itinerary for {city}, Duration: {duration} days")
+
+        chunks = self.itinerary_chunks(duration)
+        if chunks:
+            with span("openai.itinerary_chunked"):
+                futures = [
+                    self.chunk_executor.submit(
+                        self._request_chunk, city, preferences, duration, start_date, end_date, user_input, days
+                    )
+                    for days in chunks
+                ]
+                contents = [future.result() for future in futures]
+            return self._merge_chunks(cache_key, chunks, contents)
+
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input)
+        itinerary = None
+
+        # A truncated plan is retried once with more tokens, and returned uncached if it is still short.
+        for attempt in range(2):
+            try:
+                with span("openai.itinerary"):
+                    response = self.http.post(
+                        self.url,
+                        headers=self.headers,
+                        json=payload
+                    )
+                    response.raise_for_status()
+                    data = response.json()
+                itinerary, complete = self._itinerary_from_response(cache_key, data, duration)
+
+            except Exception as e:
+                print(f"Error calling OpenAI: {e}")
+                return itinerary
+
+            if complete:
+                break
+            payload = self._retry_payload(payload)
+        return itinerary
+
+    def _request_chunk(self, city, preferences, duration, start_date, end_date, user_input, days):
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input, days)
+
+        try:
+            with span("openai.itinerary_chunk"):
+                response = self.http.post(self.url, headers=self.headers, json=payload)
+                response.raise_for_status()
+                return response.json()['choices'][0]['message']['content']
         except Exception as e:
-            print(f"Error calling OpenAI: {e}")
+            print(f"Error calling OpenAI for days {days[0]}-{days[1]}: {e}")
             return None
 
-    def _parse_itinerary(self, text):
+    def _itinerary_from_response(self, cache_key, data, duration):
+        choice = data['choices'][0]
+        content = choice['message']['content']
+        debug("DEBUG: Received response from OpenAI. Parsing...")
+        with span("itinerary.parse"):
+            parsed = self._parse_itinerary(content)
+        debug(f"DEBUG: Parsed {len(parsed) if parsed else 0} days.")
+        complete = isinstance(parsed, list) and self._itinerary_complete(parsed, duration, choice.get('finish_reason'))
+        if complete:
+            self.itinerary_cache.set(cache_key, parsed)
+        return parsed, complete
+
+    def stream_itinerary(self, city, preferences, duration, start_date, end_date, user_input=""):
+        cache_key = self.itinerary_cache_key(city, preferences, duration, user_input)
+        cached = self.itinerary_cache.get(cache_key)
+        if cached is not None:
+            debug(f"DEBUG: Itinerary cache hit for {city}, Duration: {duration} days")
+            for day in cached:
+                yield "day", day
+            return
+
+        debug(f"DEBUG: Streaming itinerary for {city}, Duration: {duration} days")
+
+        day_ranges = self.itinerary_chunks(duration)
+        if day_ranges:
+            yield from self._stream_chunked(
+                cache_key, city, preferences, duration, start_date, end_date, user_input, day_ranges
+            )
+            return
+
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input)
+        payload["stream"] = True
+
+        parser = ItineraryParser()
         itinerary = []
-        current_day = None
+        chunks = []
+        pending = ""
+        finish_reasons = []
 
-        day_pattern = re.compile(r"Day\s+(\d+)\s*[:|-]\s*(.*)", re.IGNORECASE)
+        try:
+            with span("openai.itinerary_stream"), self.http.post(self.url, headers=self.headers, json=payload, stream=True) as response:
+                response.raise_for_status()
 
-        activity_pattern = re.compile(r"^[-*]\s*(?:(?:\*\*)?(.+?)(?:\*\*)?)\s*:\s*(?:(?:\*\*)?(.+?)(?:\*\*)?)(?:\s+-\s+(.+))?$", re.IGNORECASE)
+                for delta in self._stream_deltas(response, finish_reasons):
+                    chunks.append(delta)
+                    days, pending = self._feed_delta(parser, pending, delta)
+                    for day in days:
+                        itinerary.append(day)
+                        yield "day", day
 
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+        except Exception as e:
+            print(f"Error streaming from OpenAI: {e}")
+            return
 
-            day_match = day_pattern.search(line)
-            if day_match:
-                if current_day:
-                    itinerary.append(current_day)
-                
-                day_num = day_match.group(1)
-                day_title = day_match.group(2).strip().replace("**", "").replace('": [', '').replace('"', '').replace(":", "")
-                
-                current_day = {
-                    "day": day_num,
-                    "title": day_title,
-                    "activities": []
-                }
-                continue
+        for day in (parser.feed_line(pending), parser.close()):
+            if day:
+                itinerary.append(day)
+                yield "day", day
+
+        if not itinerary:
+            yield "raw_text", "".join(chunks)
+        elif self._itinerary_complete(itinerary, duration, finish_reasons[-1] if finish_reasons else None):
+            self.itinerary_cache.set(cache_key, itinerary)
+        else:
+            yield "incomplete", None
+
+    def _stream_chunked(self, cache_key, city, preferences, duration, start_date, end_date, user_input, chunks):
+        # The first chunk is streamed so its days arrive early; the rest are requested in parallel
+        # and emitted in order once the days before them have been sent.
+        futures = [
+            self.chunk_executor.submit(
+                self._request_chunk, city, preferences, duration, start_date, end_date, user_input, days
+            )
+            for days in chunks[1:]
+        ]
+
+        first_days = chunks[0]
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input, first_days)
+        payload["stream"] = True
+
+        parser = ItineraryParser()
+        itinerary = []
+        texts = []
+        pending = ""
+        complete = True
+
+        try:
+            try:
+                with span("openai.itinerary_stream"), self.http.post(self.url, headers=self.headers, json=payload, stream=True) as response:
+                    response.raise_for_status()
+
+                    for delta in self._stream_deltas(response):
+                        texts.append(delta)
+                        days, pending = self._feed_delta(parser, pending, delta)
+                        for day in days:
+                            if len(itinerary) <= first_days[1] - first_days[0]:
+                                itinerary.append(self._number_day(day, first_days, len(itinerary)))
+                                yield "day", day
+            except Exception as e:
+                print(f"Error streaming from OpenAI: {e}")
+                complete = False
+            else:
+                for day in (parser.feed_line(pending), parser.close()):
+                    if day and len(itinerary) <= first_days[1] - first_days[0]:
+                        itinerary.append(self._number_day(day, first_days, len(itinerary)))
+                        yield "day", day
 
-            if current_day and (line.startswith("-") or line.startswith("*") or (len(line)>1 and line[0].isdigit() and line[1]=='.')):
-
-                clean_line = re.sub(r"^[-*0-9.]+\s*", "", line)
-
-                title = ""
-                time_val = "Anytime"
-                desc = ""
-
-                if ":" in clean_line:
-                    parts = clean_line.split(":", 1)
-                    potential_time = parts[0].strip().replace("*", "")
-
-                    if len(potential_time) < 20:
-                        time_val = potential_time
-                        remainder = parts[1].strip()
-                    else:
-                        remainder = clean_line
-                else:
-                    remainder = clean_line
-
-                if " - " in remainder:
-                    title_desc = remainder.split(" - ", 1)
-                    title = title_desc[0].strip().replace("**", "")
-                    desc = title_desc[1].strip()
-                elif ": " in remainder:
-                    title_desc = remainder.split(": ", 1)
-                    title = title_desc[0].strip().replace("**", "")
-                    desc = title_desc[1].strip()
-                else:
-                    title = remainder.strip().replace("**", "")
-                    desc = ""
-
-                if not title:
-                    continue
-
-                current_day["activities"].append({
-                    "time": time_val,
-                    "title": title,
-                    "desc": desc
-                })
-
-        if current_day:
-            itinerary.append(current_day)
+            complete = complete and len(itinerary) == first_days[1] - first_days[0] + 1
+
+            for days, future in zip(chunks[1:], futures):
+                content = future.result()
+                if content:
+                    texts.append("\n\n" + content)
+                parsed = self._chunk_days(content, days)
+                complete = complete and len(parsed) == days[1] - days[0] + 1
+                for day in parsed:
+                    itinerary.append(day)
+                    yield "day", day
+        finally:
+            for future in futures:
+                future.cancel()
+
+        if itinerary and complete:
+            self.itinerary_cache.set(cache_key, itinerary)
+        elif not itinerary and texts:
+            yield "raw_text", "".join(texts)
+        elif itinerary:
+            yield "incomplete", None
+
+    def _stream_deltas(self, response, finish_reasons=None):
+        for raw_line in response.iter_lines(decode_unicode=True):
+            finished, content, finish_reason = self._sse_delta(raw_line)
+            if finished:
+                break
+            if finish_reason and finish_reasons is not None:
+                finish_reasons.append(finish_reason)
+            if content:
+                yield content
+
+    def _sse_delta(self, raw_line):
+        if not raw_line or not raw_line.startswith("data:"):
+            return False, None, None
+
+        data = raw_line[len("data:"):].strip()
+        if data == "[DONE]":
+            return True, None, None
+
+        choice = (json.loads(data).get('choices') or [{}])[0]
+        return False, choice.get('delta', {}).get('content'), choice.get('finish_reason')
+
+    def _feed_delta(self, parser, pending, delta):
+        pending += delta
+        *lines, pending = pending.split('\n')
+        days = [day for day in map(parser.feed_line, lines) if day]
+        return days, pending
+
+    def _parse_itinerary(self, text):
+        itinerary = ItineraryParser.parse(text)
 
         if not itinerary:
             return {"raw_text": text}
             
         return itinerary
 
+    def fallback_city_brief(self, city):
+        return f"Discover the beauty of {city}!"
+
     def get_city_brief(self, city):
+        try:
+            return self.generate_city_brief(city)
+        except Exception as e:
+            print(f"Error fetching city brief: {e}")
+            return self.fallback_city_brief(city)
+
+    def _city_brief_payload(self, city):
 
         prompt = f"Write a short, inspiring 2-sentence description of {city} that would make a traveler want to visit immediately."
         
-        payload = {
+        return {
             "model": "gpt-4o-mini",
             "messages": [
                 {"role": "system", "content": "You are an enthusiastic travel copywriter."},
@@ -154,14 +534,227 @@ User's Dream Holiday Description: "{user_input}"
             "max_tokens": 100
         }
 
-        try:
-            response = requests.post(
+    def generate_city_brief(self, city):
+        with span("openai.city_brief"):
+            response = self.http.post(
                 self.url,
                 headers=self.headers,
-                json=payload
+                json=self._city_brief_payload(city)
             )
             response.raise_for_status()
             return response.json()['choices'][0]['message']['content']
+
+class AsyncOpenAIService(OpenAIService):
+    def __init__(self, itinerary_cache=None, http_client=None):
+        super().__init__(
+            itinerary_cache,
+            http_client or get_async_client("openai", connect_timeout=5, read_timeout=120)
+        )
+        self.flights = AsyncSingleFlight()
+
+    async def get_itinerary(self, city, preferences, duration, start_date, end_date, user_input=""):
+        cache_key = self.itinerary_cache_key(city, preferences, duration, user_input)
+        cached = self.itinerary_cache.get(cache_key)
+        if cached is not None:
+            debug(f"DEBUG: Itinerary cache hit for {city}, Duration: {duration} days")
+            return cached
+
+        return await self.flights.do(
+            cache_key, self._request_itinerary,
+            cache_key, city, preferences, duration, start_date, end_date, user_input
+        )
+
+    async def _request_itinerary(self, cache_key, city, preferences, duration, start_date, end_date, user_input):
+        debug(f"DEBUG: Requesting itinerary for {city}, Duration: {duration} days")
+
+        chunks = self.itinerary_chunks(duration)
+        if chunks:
+            with span("openai.itinerary_chunked"):
+                contents = await asyncio.gather(*(
+                    self._request_chunk(city, preferences, duration, start_date, end_date, user_input, days)
+                    for days in chunks
+                ))
+            return self._merge_chunks(cache_key, chunks, contents)
+
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input)
+        itinerary = None
+
+        for attempt in range(2):
+            try:
+                with span("openai.itinerary"):
+                    response = await self.http.post(self.url, headers=self.headers, json=payload)
+                    response.raise_for_status()
+                    data = response.json()
+                itinerary, complete = self._itinerary_from_response(cache_key, data, duration)
+
+            except Exception as e:
+                print(f"Error calling OpenAI: {e}")
+                return itinerary
+
+            if complete:
+                break
+            payload = self._retry_payload(payload)
+        return itinerary
+
+    async def _request_chunk(self, city, preferences, duration, start_date, end_date, user_input, days):
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input, days)
+
+        try:
+            with span("openai.itinerary_chunk"):
+                response = await self.http.post(self.url, headers=self.headers, json=payload)
+                response.raise_for_status()
+                return response.json()['choices'][0]['message']['content']
+        except Exception as e:
+            print(f"Error calling OpenAI for days {days[0]}-{days[1]}: {e}")
+            return None
+
+    async def stream_itinerary(self, city, preferences, duration, start_date, end_date, user_input=""):
+        cache_key = self.itinerary_cache_key(city, preferences, duration, user_input)
+        cached = self.itinerary_cache.get(cache_key)
+        if cached is not None:
+            debug(f"DEBUG: Itinerary cache hit for {city}, Duration: {duration} days")
+            for day in cached:
+                yield "day", day
+            return
+
+        debug(f"DEBUG: Streaming itinerary for {city}, Duration: {duration} days")
+
+        day_ranges = self.itinerary_chunks(duration)
+        if day_ranges:
+            async for event in self._stream_chunked(
+                cache_key, city, preferences, duration, start_date, end_date, user_input, day_ranges
+            ):
+                yield event
+            return
+
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input)
+        payload["stream"] = True
+
+        parser = ItineraryParser()
+        itinerary = []
+        chunks = []
+        pending = ""
+        finish_reasons = []
+
+        try:
+            with span("openai.itinerary_stream"):
+                response = await self.http.post(self.url, headers=self.headers, json=payload, stream=True)
+                try:
+                    response.raise_for_status()
+
+                    async for raw_line in response.aiter_lines():
+                        finished, delta, finish_reason = self._sse_delta(raw_line)
+                        if finished:
+                            break
+                        if finish_reason:
+                            finish_reasons.append(finish_reason)
+                        if not delta:
+                            continue
+
+                        chunks.append(delta)
+                        days, pending = self._feed_delta(parser, pending, delta)
+                        for day in days:
+                            itinerary.append(day)
+                            yield "day", day
+                finally:
+                    await response.aclose()
+
+        except Exception as e:
+            print(f"Error streaming from OpenAI: {e}")
+            return
+
+        for day in (parser.feed_line(pending), parser.close()):
+            if day:
+                itinerary.append(day)
+                yield "day", day
+
+        if not itinerary:
+            yield "raw_text", "".join(chunks)
+        elif self._itinerary_complete(itinerary, duration, finish_reasons[-1] if finish_reasons else None):
+            self.itinerary_cache.set(cache_key, itinerary)
+        else:
+            yield "incomplete", None
+
+    async def _stream_chunked(self, cache_key, city, preferences, duration, start_date, end_date, user_input, chunks):
+        tasks = [
+            asyncio.ensure_future(
+                self._request_chunk(city, preferences, duration, start_date, end_date, user_input, days)
+            )
+            for days in chunks[1:]
+        ]
+
+        first_days = chunks[0]
+        payload = self._itinerary_payload(city, preferences, duration, start_date, end_date, user_input, first_days)
+        payload["stream"] = True
+
+        parser = ItineraryParser()
+        itinerary = []
+        texts = []
+        pending = ""
+        complete = True
+
+        try:
+            try:
+                with span("openai.itinerary_stream"):
+                    response = await self.http.post(self.url, headers=self.headers, json=payload, stream=True)
+                    try:
+                        response.raise_for_status()
+
+                        async for raw_line in response.aiter_lines():
+                            finished, delta, _ = self._sse_delta(raw_line)
+                            if finished:
+                                break
+                            if not delta:
+                                continue
+
+                            texts.append(delta)
+                            days, pending = self._feed_delta(parser, pending, delta)
+                            for day in days:
+                                if len(itinerary) <= first_days[1] - first_days[0]:
+                                    itinerary.append(self._number_day(day, first_days, len(itinerary)))
+                                    yield "day", day
+                    finally:
+                        await response.aclose()
+            except Exception as e:
+                print(f"Error streaming from OpenAI: {e}")
+                complete = False
+            else:
+                for day in (parser.feed_line(pending), parser.close()):
+                    if day and len(itinerary) <= first_days[1] - first_days[0]:
+                        itinerary.append(self._number_day(day, first_days, len(itinerary)))
+                        yield "day", day
+
+            complete = complete and len(itinerary) == first_days[1] - first_days[0] + 1
+
+            for days, task in zip(chunks[1:], tasks):
+                content = await task
+                if content:
+                    texts.append("\n\n" + content)
+                parsed = self._chunk_days(content, days)
+                complete = complete and len(parsed) == days[1] - days[0] + 1
+                for day in parsed:
+                    itinerary.append(day)
+                    yield "day", day
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if itinerary and complete:
+            self.itinerary_cache.set(cache_key, itinerary)
+        elif not itinerary and texts:
+            yield "raw_text", "".join(texts)
+        elif itinerary:
+            yield "incomplete", None
+
+    async def get_city_brief(self, city):
+        try:
+            return await self.generate_city_brief(city)
         except Exception as e:
             print(f"Error fetching city brief: {e}")
-            return f"Discover the beauty of {city}!"
+            return self.fallback_city_brief(city)
+
+    async def generate_city_brief(self, city):
+        with span("openai.city_brief"):
+            response = await self.http.post(self.url, headers=self.headers, json=self._city_brief_payload(city))
+            response.raise_for_status()
+            return response.json()['choices'][0]['message']['content']
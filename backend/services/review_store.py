@@ -0,0 +1,254 @@
+import atexit
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from services.metrics import span
+
+MIN_RATING = 1
+MAX_RATING = 5
+RATINGS = range(MIN_RATING, MAX_RATING + 1)
+HISTOGRAM_COLUMNS = ", ".join(f"r{r}" for r in RATINGS)
+
+RETRY_BACKOFF = 0.2
+MAX_RETRY_BACKOFF = 5.0
+MAX_WRITE_ATTEMPTS = 6
+BUSY_ERROR_CODES = {5, 6}  # SQLITE_BUSY, SQLITE_LOCKED
+
+_STOP = object()
+
+
+def city_key(city):
+    return " ".join(str(city).lower().split())
+
+
+class ReviewQueueFull(Exception):
+    pass
+
+
+def is_busy(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in BUSY_ERROR_CODES
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def parse_rating(rating):
+    try:
+        value = float(rating)
+    except (TypeError, ValueError):
+        raise ValueError("Rating must be a number")
+    if not value.is_integer() or not MIN_RATING <= value <= MAX_RATING:
+        raise ValueError(f"Rating must be a whole number between {MIN_RATING} and {MAX_RATING}")
+    return int(value)
+
+
+class ReviewStore:
+    def __init__(self, db_path, legacy_csv_path=None, batch_size=200, flush_interval=0.25, start=True,
+                 max_queue=10000):
+        self.db_path = db_path
+        self.dead_letter_path = f"{db_path}.failed.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._writer = None
+
+        conn = self._connect()
+        self._create_schema(conn)
+        if legacy_csv_path and os.path.isfile(legacy_csv_path):
+            self._import_csv(conn, legacy_csv_path)
+        conn.close()
+
+        if start:
+            self.start()
+
+    def start(self):
+        # Deferred under a pre-fork server so the connection and writer thread belong to the worker.
+        if self._writer is not None:
+            return
+        self._reader = self._connect()
+        self._writer = threading.Thread(target=self._write_loop, name="review-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_schema(self, conn):
+        histogram_columns = ", ".join(f"r{r} INTEGER NOT NULL DEFAULT 0" for r in RATINGS)
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS reviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                city TEXT NOT NULL,
+                rating INTEGER NOT NULL,
+                comment TEXT
+            );
+            CREATE TABLE IF NOT EXISTS city_ratings (
+                city_key TEXT PRIMARY KEY,
+                city TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                {histogram_columns}
+            );
+        """)
+        conn.commit()
+
+    def _import_csv(self, conn, csv_path):
+        if conn.execute("SELECT 1 FROM reviews LIMIT 1").fetchone():
+            return
+
+        rows = []
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    rows.append((row['timestamp'], row['city'], parse_rating(row['rating']), row.get('comment', '')))
+                except (KeyError, ValueError):
+                    continue
+
+        self._commit_batch(conn, rows)
+        print(f"Imported {len(rows)} reviews from {csv_path}")
+
+    def _commit_batch(self, conn, rows):
+        if not rows:
+            return
+
+        deltas = {}
+        for timestamp, city, rating, comment in rows:
+            key = city_key(city)
+            delta = deltas.setdefault(key, {"city": city, "count": 0, "total": 0, "histogram": {}})
+            delta["count"] += 1
+            delta["total"] += rating
+            delta["histogram"][rating] = delta["histogram"].get(rating, 0) + 1
+
+        placeholders = ", ".join("?" for _ in RATINGS)
+        updates = ", ".join(f"r{r} = r{r} + excluded.r{r}" for r in RATINGS)
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO reviews (timestamp, city, rating, comment) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.executemany(
+                f"INSERT INTO city_ratings (city_key, city, count, total, {HISTOGRAM_COLUMNS}) "
+                f"VALUES (?, ?, ?, ?, {placeholders}) "
+                f"ON CONFLICT(city_key) DO UPDATE SET count = count + excluded.count, "
+                f"total = total + excluded.total, {updates}",
+                [
+                    (key, delta["city"], delta["count"], delta["total"], *(delta["histogram"].get(r, 0) for r in RATINGS))
+                    for key, delta in deltas.items()
+                ]
+            )
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                with span("reviews.write_batch"):
+                    self._write_batch(conn, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        # Other workers writing to the same file make the database briefly busy; that is waited
+        # out. Anything else (missing table, read-only file, full disk) will not clear by retrying.
+        for attempt in range(MAX_WRITE_ATTEMPTS):
+            try:
+                self._commit_batch(conn, batch)
+                return
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == MAX_WRITE_ATTEMPTS - 1:
+                    self._dead_letter(batch, e)
+                    return
+                delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * (2 ** attempt))
+                print(f"Database busy writing {len(batch)} reviews (attempt {attempt + 1}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            except Exception as e:
+                self._dead_letter(batch, e)
+                return
+
+    def _dead_letter(self, batch, error):
+        # Reviews the client was told were saved are kept on disk for a manual re-import.
+        print(f"Error writing {len(batch)} reviews, saving them to {self.dead_letter_path}: {error}")
+        try:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for timestamp, city, rating, comment in batch:
+                    f.write(json.dumps(
+                        {"timestamp": timestamp, "city": city, "rating": rating, "comment": comment, "error": str(error)}
+                    ) + "\n")
+        except OSError as e:
+            print(f"Dropping {len(batch)} reviews, could not write {self.dead_letter_path}: {e}")
+
+    def add(self, city, rating, comment=""):
+        rating = parse_rating(rating)
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            self._queue.put_nowait((timestamp, str(city), rating, str(comment or "")))
+        except queue.Full:
+            raise ReviewQueueFull("Too many reviews waiting to be saved, try again shortly")
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=5)
+            except queue.Full:
+                return
+            self._writer.join(timeout=5)
+
+    def summary(self, city):
+        with self._reader_lock:
+            row = self._reader.execute(
+                f"SELECT city, count, total, {HISTOGRAM_COLUMNS} FROM city_ratings WHERE city_key = ?",
+                (city_key(city),)
+            ).fetchone()
+
+        if row is None:
+            return {
+                "city": city,
+                "count": 0,
+                "mean": None,
+                "histogram": {str(r): 0 for r in RATINGS}
+            }
+
+        stored_city, count, total, *histogram = row
+        return {
+            "city": stored_city,
+            "count": count,
+            "mean": total / count if count else None,
+            "histogram": {str(r): n for r, n in zip(RATINGS, histogram)}
+        }
@@ -1,42 +1,98 @@
-import requests
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from services.cache import cache_from_env, make_key
+from services.http_client import get_async_client, get_client
+from services import logs
+from services.metrics import span
+from services.singleflight import AsyncSingleFlight, SingleFlight
+
+DEFAULT_BOOKING_URL = "https://www.tripadvisor.com"
 
 class TripAdvisorService:
-    def __init__(self):
+    def __init__(self, geo_cache=None, hotel_cache=None, http_client=None):
         self.api_key = os.getenv("T_API_KEY")
         self.host = os.getenv("HOST")
-        self.base_url = f"https://{self.host}/api/v1/hotels"
+        self.base_url = (os.getenv("RAPIDAPI_BASE_URL") or f"https://{self.host}/api/v1/hotels").rstrip('/')
         self.headers = {
             "x-rapidapi-key": self.api_key,
             "x-rapidapi-host": self.host
         }
+        if geo_cache is None:
+            geo_cache = cache_from_env("GEO_CACHE", max_entries=50000, ttl=None, table='geo_ids')
+        if hotel_cache is None:
+            hotel_cache = cache_from_env("HOTEL_CACHE", max_entries=2048, ttl=30 * 60, table='hotels')
+        self.geo_cache = geo_cache
+        self.hotel_cache = hotel_cache
+        self.http = http_client or get_client("tripadvisor", connect_timeout=3, read_timeout=15)
+        self.flights = SingleFlight()
+        self.details_timeout = float(os.getenv("HOTEL_DETAILS_TIMEOUT", 4))
+        self.details_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("HOTEL_DETAILS_WORKERS", 16)),
+            thread_name_prefix="hotel-details"
+        )
+
+    def preload_geo_ids(self, cities):
+        resolved = 0
+        for city in cities:
+            if self.get_geo_id(city):
+                resolved += 1
+        print(f"Preloaded Geo IDs for {resolved}/{len(cities)} cities")
+        return resolved
+
+    def _geo_cache_key(self, city):
+        return make_key(" ".join(str(city).lower().split()))
 
     def get_geo_id(self, city):
+        cache_key = self._geo_cache_key(city)
+        cached = self.geo_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return self.flights.do(("geo", cache_key), self._request_geo_id, cache_key, city)
+
+    def _request_geo_id(self, cache_key, city):
         url = f"{self.base_url}/searchDestination"
         querystring = {"query": city}
 
         try:
-            response = requests.get(url, headers=self.headers, params=querystring)
-            response.raise_for_status()
-            data = response.json()
-            print(f"Geo ID response for {city}: {data}")
-            
-            if data.get("status") and data.get("data"):
-                first = data["data"][0]
-                return {
-                    "dest_id": first["dest_id"]
-                }
-            else:
-                print(f"No Geo ID found for {city}")
-                return None
+            with span("tripadvisor.geo_id"):
+                response = self.http.get(url, headers=self.headers, params=querystring)
+                response.raise_for_status()
+                return self._geo_from_response(cache_key, city, response.json())
                 
         except Exception as e:
             print(f"Error fetching Geo ID: {e}")
             return None
 
+    def _geo_from_response(self, cache_key, city, data):
+        if logs.VERBOSE:
+            print(f"Geo ID response for {city}: {data}")
+        
+        if data.get("status") and data.get("data"):
+            first = data["data"][0]
+            geo = {
+                "dest_id": first["dest_id"]
+            }
+            self.geo_cache.set(cache_key, geo)
+            return geo
+        else:
+            print(f"No Geo ID found for {city}")
+            return None
+
+    def _hotels_cache_key(self, geo_id, check_in, check_out):
+        return make_key(str(geo_id), check_in, check_out)
+
     def get_hotels(self, geo_id, check_in, check_out):
-        url = f"{self.base_url}/searchHotels"
-        querystring = {
+        cache_key = self._hotels_cache_key(geo_id, check_in, check_out)
+        cached = self.hotel_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return self.flights.do(("hotels", cache_key), self._request_hotels, cache_key, geo_id, check_in, check_out)
+
+    def _hotels_query(self, geo_id, check_in, check_out):
+        return {
             "dest_id": geo_id,
             "arrival_date": check_in,
             "departure_date": check_out,
@@ -46,11 +102,17 @@ class TripAdvisorService:
             "currency": "USD"
         }
 
+    def _request_hotels(self, cache_key, geo_id, check_in, check_out):
+        url = f"{self.base_url}/searchHotels"
+        querystring = self._hotels_query(geo_id, check_in, check_out)
+
         try:
-            response = requests.get(url, headers=self.headers, params=querystring)
-            response.raise_for_status()
-            raw = response.json()
-            print(f"Hotels response: {raw}")
+            with span("tripadvisor.hotels"):
+                response = self.http.get(url, headers=self.headers, params=querystring)
+                response.raise_for_status()
+                raw = response.json()
+            if logs.VERBOSE:
+                print(f"Hotels response: {raw}")
 
             basic_hotels = self.clean_hotels(raw, limit=5)
 
@@ -58,10 +120,12 @@ class TripAdvisorService:
                 print("No hotels found in API, using mock data")
                 return self.get_mock_hotels()
 
-            hotels_with_urls = self.fetch_all_hotel_details(
+            hotels_with_urls, complete = self._fetch_hotel_details(
             basic_hotels, check_in, check_out
             )
 
+            if complete:
+                self.hotel_cache.set(cache_key, hotels_with_urls)
             return hotels_with_urls
             
         except Exception as e:
@@ -94,30 +158,48 @@ class TripAdvisorService:
         }
 
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-
-            data = response.json()
-            booking_url = data.get("data", {}).get("url")
-
-            return {
-                "hotel_id": hotel_id,
-                "booking_url": booking_url
-            }
+            with span("tripadvisor.hotel_details"):
+                response = self.http.get(url, headers=self.headers, params=params)
+                response.raise_for_status()
+                return self._details_from_response(hotel_id, response.json())
 
         except Exception as e:
             print(f"Error fetching hotel details: {e}")
             return None
 
+    def _details_from_response(self, hotel_id, data):
+        booking_url = data.get("data", {}).get("url")
+
+        return {
+            "hotel_id": hotel_id,
+            "booking_url": booking_url
+        }
+
     
 
     def fetch_all_hotel_details(self, hotels, check_in, check_out):
-        detailed_list = []
+        return self._fetch_hotel_details(hotels, check_in, check_out)[0]
 
-        for h in hotels:
-            details = self.get_hotel_details(h["hotel_id"], check_in, check_out)
+    def _fetch_hotel_details(self, hotels, check_in, check_out):
+        futures = [
+            self.details_executor.submit(self.get_hotel_details, h["hotel_id"], check_in, check_out)
+            for h in hotels
+        ]
+        done, pending = wait(futures, timeout=self.details_timeout)
+
+        if pending:
+            print(f"{len(pending)} hotel detail lookups exceeded {self.details_timeout}s, using default booking URL")
+            for future in pending:
+                future.cancel()
+
+        details = [future.result() if future in done else None for future in futures]
+        return self._merge_details(hotels, details), not pending
+
+    def _merge_details(self, hotels, details_list):
+        detailed_list = []
 
-            booking_url = details.get("booking_url") if details else "https://www.tripadvisor.com"
+        for h, details in zip(hotels, details_list):
+            booking_url = details.get("booking_url") if details else DEFAULT_BOOKING_URL
 
             detailed_list.append({
                 **h,
@@ -133,21 +215,135 @@ class TripAdvisorService:
                 "rating": 4.5,
                 "image": "https://via.placeholder.com/150/6366f1/ffffff?text=Hotel1",
                 "priceLevel": "$$",
-                "booking_url": "https://www.tripadvisor.com"
+                "booking_url": DEFAULT_BOOKING_URL
             },
             {
                 "name": "City Center Inn",
                 "rating": 4.0,
                 "image": "https://via.placeholder.com/150/6366f1/ffffff?text=Hotel2",
                 "priceLevel": "$$$",
-                "booking_url": "https://www.tripadvisor.com"
+                "booking_url": DEFAULT_BOOKING_URL
             },
             {
                 "name": "Budget Stay Hotel",
                 "rating": 4.2,
                 "image": "https://via.placeholder.com/150/6366f1/ffffff?text=Hotel3",
                 "priceLevel": "$",
-                "booking_url": "https://www.tripadvisor.com"
+                "booking_url": DEFAULT_BOOKING_URL
             }
         ]
-    
+
+class AsyncTripAdvisorService(TripAdvisorService):
+    def __init__(self, geo_cache=None, hotel_cache=None, http_client=None):
+        super().__init__(
+            geo_cache, hotel_cache,
+            http_client or get_async_client("tripadvisor", connect_timeout=3, read_timeout=15)
+        )
+        self.flights = AsyncSingleFlight()
+
+    async def preload_geo_ids(self, cities):
+        resolved = 0
+        for city in cities:
+            if await self.get_geo_id(city):
+                resolved += 1
+        print(f"Preloaded Geo IDs for {resolved}/{len(cities)} cities")
+        return resolved
+
+    async def get_geo_id(self, city):
+        cache_key = self._geo_cache_key(city)
+        cached = self.geo_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return await self.flights.do(("geo", cache_key), self._request_geo_id, cache_key, city)
+
+    async def _request_geo_id(self, cache_key, city):
+        url = f"{self.base_url}/searchDestination"
+
+        try:
+            with span("tripadvisor.geo_id"):
+                response = await self.http.get(url, headers=self.headers, params={"query": city})
+                response.raise_for_status()
+                return self._geo_from_response(cache_key, city, response.json())
+
+        except Exception as e:
+            print(f"Error fetching Geo ID: {e}")
+            return None
+
+    async def get_hotels(self, geo_id, check_in, check_out):
+        cache_key = self._hotels_cache_key(geo_id, check_in, check_out)
+        cached = self.hotel_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        return await self.flights.do(
+            ("hotels", cache_key), self._request_hotels, cache_key, geo_id, check_in, check_out
+        )
+
+    async def _request_hotels(self, cache_key, geo_id, check_in, check_out):
+        url = f"{self.base_url}/searchHotels"
+
+        try:
+            with span("tripadvisor.hotels"):
+                response = await self.http.get(
+                    url, headers=self.headers, params=self._hotels_query(geo_id, check_in, check_out)
+                )
+                response.raise_for_status()
+                raw = response.json()
+            if logs.VERBOSE:
+                print(f"Hotels response: {raw}")
+
+            basic_hotels = self.clean_hotels(raw, limit=5)
+
+            if not basic_hotels:
+                print("No hotels found in API, using mock data")
+                return self.get_mock_hotels()
+
+            hotels_with_urls, complete = await self._fetch_hotel_details(basic_hotels, check_in, check_out)
+
+            if complete:
+                self.hotel_cache.set(cache_key, hotels_with_urls)
+            return hotels_with_urls
+
+        except Exception as e:
+            print(f"Error fetching hotels: {e}")
+            return self.get_mock_hotels()
+
+    async def get_hotel_details(self, hotel_id, check_in, check_out):
+        url = f"{self.base_url}/getHotelDetails"
+        params = {
+            "hotel_id": hotel_id,
+            "arrival_date": check_in,
+            "departure_date": check_out
+        }
+
+        try:
+            with span("tripadvisor.hotel_details"):
+                response = await self.http.get(url, headers=self.headers, params=params)
+                response.raise_for_status()
+                return self._details_from_response(hotel_id, response.json())
+
+        except Exception as e:
+            print(f"Error fetching hotel details: {e}")
+            return None
+
+    async def fetch_all_hotel_details(self, hotels, check_in, check_out):
+        return (await self._fetch_hotel_details(hotels, check_in, check_out))[0]
+
+    async def _fetch_hotel_details(self, hotels, check_in, check_out):
+        tasks = [
+            asyncio.ensure_future(self.get_hotel_details(h["hotel_id"], check_in, check_out))
+            for h in hotels
+        ]
+        if not tasks:
+            return [], True
+
+        done, pending = await asyncio.wait(tasks, timeout=self.details_timeout)
+
+        if pending:
+            print(f"{len(pending)} hotel detail lookups exceeded {self.details_timeout}s, using default booking URL")
+            for task in pending:
+                task.cancel()
+
+        details = [task.result() if task in done else None for task in tasks]
+        return self._merge_details(hotels, details), not pending